@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AuctionConfig(AppConfig):
     name = 'auction'
     verbose_name = 'Auction'
+
+    def ready(self):
+        # registers the task handlers, the search index, the change counter and the token revocation signals
+        import auction.tasks  # noqa: F401
+        import auction.search  # noqa: F401
+        import auction.etags  # noqa: F401
+        import auction.authentication  # noqa: F401
@@ -0,0 +1,187 @@
+from datetime import datetime, timezone
+
+from django.db import transaction
+from django.db.models import F
+
+from auction.live import publish
+from auction.models import AuctionModel, Bid, ProxyBid
+from auction.money import Money
+
+
+class BidResult:
+    ACCEPTED = 'accepted'
+    OUTBID = 'outbid'
+    CONFLICT = 'conflict'
+    OWN_AUCTION = 'own_auction'
+    INACTIVE = 'inactive'
+
+    def __init__(self, status, auction, amount, bid=None):
+        self.status = status
+        self.auction = auction
+        self.amount = amount
+        self.bid = bid
+
+    @property
+    def accepted(self):
+        return self.status == BidResult.ACCEPTED
+
+
+def check_bid(auction, user, amount, version=None):
+    """The status a bid of `amount` Money on `auction` is turned down with, None when it can be written."""
+    if version is not None and version != auction.version:
+        return BidResult.CONFLICT
+
+    if auction.seller_id == user.id:
+        return BidResult.OWN_AUCTION
+
+    if auction.status != AuctionModel.ACTIVE or auction.deadline_date < datetime.now(timezone.utc):
+        return BidResult.INACTIVE
+
+    if amount.cents <= auction.highest_bid.cents:
+        return BidResult.OUTBID
+
+    return None
+
+
+def place_bid(auction_id, user, amount, version=None):
+    """
+    Place a bid with a single conditional UPDATE.
+
+    The row is read once to validate the bid, then written only if its highest bid is still at least a cent below the
+    new one (and the version is still the one the client saw, when given), and the bid is appended to the history in
+    the same transaction. `amount` is Money, or anything Money.parse takes. A lost race is reported as OUTBID, or as
+    CONFLICT when the client bid against a specific version.
+    """
+    amount = Money.parse(amount)
+    auction = AuctionModel.objects.get(id=auction_id)
+
+    status = check_bid(auction, user, amount, version)
+    if status:
+        return BidResult(status, auction, amount)
+
+    # integer cents: the database itself rejects the bid once a concurrent one reached the same amount
+    guard = {'id': auction.id, 'status': AuctionModel.ACTIVE, 'highest_bid__lt': amount}
+    if version is not None:
+        guard['version'] = version
+
+    with transaction.atomic():
+        updated = AuctionModel.objects.filter(**guard).update(
+            highest_bid=amount,
+            highest_bidder=user,
+            bid_count=F('bid_count') + 1,
+            version=F('version') + 1
+        )
+
+        if not updated:
+            return BidResult(BidResult.CONFLICT if version is not None else BidResult.OUTBID, auction, amount)
+
+        bid = Bid.objects.create(auction_id=auction.id, bidder_id=user.id, amount=amount)
+
+        auction.highest_bid = amount
+        auction.highest_bidder = user
+        auction.bid_count = auction.bid_count + 1
+        auction.version = auction.version + 1
+        # the maximum bids of the others answer before the row is released
+        settle_proxies(auction)
+        publish(auction)
+
+    return BidResult(BidResult.ACCEPTED, auction, amount, bid)
+
+
+def proxy_bids(auction, now=None):
+    """
+    The Bid rows the maximum bids registered on `auction` place against its current highest bid, in the order they
+    are placed, without writing them.
+
+    Only the two highest maximums matter: the highest takes the lead for a cent more than the runner-up's maximum (or
+    the current bid), the runner-up is bid up to its maximum first. Both are the first two entries of the auction's
+    range of the (auction, -maximum, placed_at) index, so this is one index seek however many maximums there are. On a
+    tie the earlier maximum wins.
+    """
+    if auction.status != AuctionModel.ACTIVE or auction.deadline_date < datetime.now(timezone.utc):
+        return []
+
+    proxies = list(ProxyBid.objects.filter(auction_id=auction.id).select_related('bidder')
+                   .order_by('-maximum', 'placed_at')[:2])
+    if not proxies:
+        return []
+
+    top = proxies[0]
+    price = auction.highest_bid
+    leading = top.bidder_id == auction.highest_bidder_id
+    if not leading and top.maximum.cents <= price.cents:
+        return []
+
+    bids = []
+    competing = None if leading else price
+    if len(proxies) > 1 and proxies[1].maximum.cents > price.cents:
+        runner_up = proxies[1]
+        if runner_up.maximum.cents < top.maximum.cents:
+            bids.append(Bid(auction_id=auction.id, bidder=runner_up.bidder, amount=runner_up.maximum, created_at=now))
+            competing = runner_up.maximum
+        else:
+            # a tie, the earlier maximum takes the lead at the amount both would pay
+            competing = top.maximum - Money(1)
+
+    if competing is None:
+        return []
+
+    amount = Money(min(top.maximum.cents, competing.cents + 1))
+    bids.append(Bid(auction_id=auction.id, bidder=top.bidder, amount=amount, created_at=now))
+    return bids
+
+
+def settle_proxies(auction):
+    """
+    Write the bids proxy_bids places on `auction`, whose row the caller's transaction must hold, and move the in-memory
+    auction along. Every placed bid bumps the version like a bid of its own. Returns the created Bid rows.
+    """
+    bids = proxy_bids(auction, datetime.now(timezone.utc))
+    if not bids:
+        return []
+
+    leader = bids[-1]
+    updated = AuctionModel.objects.filter(id=auction.id, version=auction.version).update(
+        highest_bid=leader.amount,
+        highest_bidder=leader.bidder,
+        bid_count=F('bid_count') + len(bids),
+        version=F('version') + len(bids)
+    )
+    if not updated:
+        return []
+
+    Bid.objects.bulk_create(bids)
+    auction.highest_bid = leader.amount
+    auction.highest_bidder = leader.bidder
+    auction.bid_count = auction.bid_count + len(bids)
+    auction.version = auction.version + len(bids)
+    return bids
+
+
+def place_max_bid(auction_id, user, maximum, version=None):
+    """
+    Register `maximum` as the most `user` pays for the auction, replacing their previous maximum, and bid on their
+    behalf right away. From then on every accepted bid on the auction is answered with the least amount that keeps the
+    highest maximum on top, without further requests. The maximum must beat the current highest bid by a cent like any
+    bid. Returns a BidResult for `maximum` with the auction as settled.
+    """
+    maximum = Money.parse(maximum)
+    while True:
+        auction = AuctionModel.objects.get(id=auction_id)
+        status = check_bid(auction, user, maximum, version)
+        if status:
+            return BidResult(status, auction, maximum)
+
+        with transaction.atomic():
+            # a write first, which takes the lock only while the row is still the one checked, a bid that landed in
+            # between sends the maximum back to be checked against it
+            if not AuctionModel.objects.filter(id=auction.id, version=auction.version).update(version=F('version')):
+                continue
+
+            placed_at = datetime.now(timezone.utc)
+            if not ProxyBid.objects.filter(auction=auction, bidder=user).update(maximum=maximum, placed_at=placed_at):
+                ProxyBid.objects.create(auction=auction, bidder=user, maximum=maximum, placed_at=placed_at)
+            if settle_proxies(auction):
+                publish(auction)
+
+        return BidResult(BidResult.ACCEPTED, auction, maximum)
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.utils import translation
+from django.utils.safestring import mark_safe
+
+from auction.currency import converted
+
+
+def card_key(auction, currency, superuser):
+    # version changes on every edit and bid, status on ban and resolve, and the converted price covers the exchange rate
+    return 'auction_card:%d:%d:%s:%s:%r:%s:%d' % (auction.id, auction.version, auction.status, currency,
+                                                  converted(auction, 'highest_bid'), translation.get_language(),
+                                                  superuser)
+
+
+def render_cards(request, auctions, currency):
+    """
+    Pairs of (auction, rendered card) for the auction list. All cards of the page are fetched from the cache in one
+    round trip and only the missing ones are rendered.
+    """
+    cache = caches['cards']
+    superuser = request.user.is_superuser
+    keys = [card_key(auction, currency, superuser) for auction in auctions]
+    cards = cache.get_many(keys)
+
+    missing = {}
+    template = None
+    for auction, key in zip(auctions, keys):
+        if key not in cards:
+            template = template or get_template('auctionCard.html')
+            missing[key] = cards[key] = template.render({'auction': auction, 'currency': currency}, request)
+    if missing:
+        cache.set_many(missing, settings.AUCTION_CARD_CACHE_TIMEOUT)
+
+    return [(auction, mark_safe(cards[key])) for auction, key in zip(auctions, keys)]
@@ -0,0 +1,8 @@
+from django.conf import settings
+
+from auction.currency import get_currency
+
+
+def currency(request):
+    """The display currency and the currencies it can be switched to, for the navigation bar."""
+    return {'currency': get_currency(request), 'currencies': settings.CURRENCIES}
@@ -0,0 +1,23 @@
+import time
+
+from django.core.cache import cache
+
+
+def _start():
+    # milliseconds, so a counter lost with the cache starts over above every value handed out before
+    return int(time.time() * 1000)
+
+
+def read_counter(key):
+    """The value of the counter `key` in the shared cache, seeded from the clock when it is missing."""
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _start(), None)
+        value = cache.get(key)
+    return value
+
+
+def bump_counter(key):
+    """Increment the counter `key` in the shared cache, seeded from the clock when it is missing."""
+    cache.add(key, _start(), None)
+    cache.incr(key)
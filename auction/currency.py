@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db.models import ExpressionWrapper, F, FloatField, Value
+
+from auction.rates import get_quotes
+
+# stored amounts are in BASE_CURRENCY, the converted ones are annotated next to them with this suffix
+CONVERTED_SUFFIX = '_converted'
+PRICE_FIELDS = ('minimum_price', 'highest_bid')
+
+
+def currency_rates():
+    """
+    Rate from BASE_CURRENCY to every currency of CURRENCIES, derived from the USD based provider quotes. Currencies
+    without a quote are left out.
+    """
+    quotes = get_quotes() or {}
+    base = settings.BASE_CURRENCY.upper()
+    base_quote = 1.0 if base == 'USD' else quotes.get('USD' + base)
+
+    rates = {settings.BASE_CURRENCY: 1.0}
+    if not base_quote:
+        return rates
+
+    for code in settings.CURRENCIES:
+        quote = 1.0 if code.upper() == 'USD' else quotes.get('USD' + code.upper())
+        if quote:
+            rates[code] = quote / base_quote
+    return rates
+
+
+def get_currency(request):
+    """The display currency of the request, ?currency= first, then the currency cookie."""
+    code = request.GET.get('currency') or request.COOKIES.get(settings.CURRENCY_COOKIE_NAME) or ''
+    code = code.lower()
+    return code if code in settings.CURRENCIES else settings.BASE_CURRENCY
+
+
+def with_prices(queryset, currency):
+    """
+    Annotate `queryset` with the prices converted to `currency`, one multiplication done by the database. The stored
+    amounts are never touched. An unknown rate falls back to the base currency, returns (queryset, currency).
+    """
+    rate = currency_rates().get(currency)
+    if rate is None:
+        currency, rate = settings.BASE_CURRENCY, 1.0
+
+    # the columns hold cents, the converted amounts are whole units of `currency`
+    return queryset.annotate(**{
+        field + CONVERTED_SUFFIX: ExpressionWrapper(F(field) * Value(rate / 100), output_field=FloatField())
+        for field in PRICE_FIELDS
+    }), currency
+
+
+def converted(auction, field):
+    """The converted amount of `field` when the auction was loaded through with_prices, the stored one otherwise."""
+    return getattr(auction, field + CONVERTED_SUFFIX, getattr(auction, field))
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from auction.models import Bid
+from metrics.registry import timed
+from tasks.queue import enqueue
+
+# set while a digest window of the seller is open, the bids it covers are mailed when it closes
+WINDOW_KEY = 'seller_digest:%d'
+
+
+def schedule_digest(seller_id, since):
+    """
+    Open a digest window of SELLER_DIGEST_WINDOW seconds from `since`, the time of the bid that opens it, unless the
+    seller already has one open. Returns whether a window was opened.
+    """
+    until = since + timezone.timedelta(seconds=settings.SELLER_DIGEST_WINDOW)
+    if not cache.add(WINDOW_KEY % seller_id, True, (until - timezone.now()).total_seconds()):
+        return False
+
+    enqueue('auction.seller_digest', run_at=until, seller_id=seller_id, since=since, until=until)
+    return True
+
+
+def send_digest(seller_id, since, until):
+    """
+    One message to the seller summing up the bids on their auctions from `since` to `until`, returns if it was sent.
+    """
+    auctions = list(Bid.objects.filter(auction__seller_id=seller_id, created_at__gte=since, created_at__lt=until)
+                    .values('auction_id', 'auction__title').annotate(bids=Count('id'), highest=Max('amount'))
+                    .order_by('auction_id'))
+    email = User.objects.filter(id=seller_id).exclude(email='').values_list('email', flat=True).first()
+    if not auctions or not email:
+        return False
+
+    lines = ['Auction #%d %s: %d new bid%s, the highest is %s' % (
+        auction['auction_id'], auction['auction__title'], auction['bids'], 's' if auction['bids'] > 1 else '',
+        auction['highest']) for auction in auctions]
+    message = EmailMessage('Your auctions have been bid', '\n'.join(lines), 'yaas-no-reply@yaas.com', [email])
+    with timed('mail', 'seller_digest'):
+        message.send()
+    return True
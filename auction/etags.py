@@ -0,0 +1,50 @@
+import hashlib
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from auction.counters import bump_counter, read_counter
+from auction.models import AuctionModel
+
+# bumped after every commit that changes what the auction lists show, their ETags are derived from it
+CHANGES_KEY = 'auctions:changes'
+
+
+def changes():
+    """The current value of the auction change counter."""
+    return read_counter(CHANGES_KEY)
+
+
+def auctions_changed():
+    """
+    Bump the change counter once the current transaction commits, so no request can pair the new value with the old
+    rows. Writes that bypass the save signals (queryset updates, bulk_create) call it themselves.
+    """
+    transaction.on_commit(lambda: bump_counter(CHANGES_KEY))
+
+
+def make_etag(*parts):
+    """A strong ETag of `parts`, everything a representation depends on."""
+    return '"%s"' % hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def conditional(response, etag):
+    """Mark `response` as `etag`, to be revalidated before every reuse, per language and currency cookie."""
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ('Accept-Language', 'Cookie'))
+    return response
+
+
+def not_modified(request, etag):
+    """The 304 to answer with when the client already has `etag`, None when the response has to be built."""
+    response = get_conditional_response(request, etag=etag)
+    return None if response is None else conditional(response, etag)
+
+
+@receiver(post_save, sender=AuctionModel)
+@receiver(post_delete, sender=AuctionModel)
+def auction_saved(sender, instance, **kwargs):
+    auctions_changed()
@@ -0,0 +1,131 @@
+import multiprocessing
+import random
+from contextlib import nullcontext
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from auction.etags import auctions_changed
+from auction.models import AuctionModel, Bid
+from auction.money import Money
+from auction.search import get_index
+from user.models import Language
+
+DEFAULT_PASSWORD = 'yaas1234'
+
+WORDS = ("bacon pork belly short ribs tenderloin strip steak landjaeger biltong meatball flank kielbasa shank spare "
+         "venison sirloin loin tri-tip chop tongue beef doner alcatra cupim pastrami boudin corned leberkas ribeye "
+         "buffalo filet mignon prosciutto rump sausage bresaola cow").split()
+
+
+def _next_id(model):
+    return (model.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+
+
+def create_users(count, password, batch_size, first_id):
+    """Users with ids from `first_id` on, all sharing one password hash, and their Language rows."""
+    # bulk_create skips the post_save signal that creates the Language row, and hashing once is what makes it fast
+    password = make_password(password)
+    joined = timezone.now()
+    for start in range(first_id, first_id + count, batch_size):
+        ids = range(start, min(start + batch_size, first_id + count))
+        with transaction.atomic():
+            User.objects.bulk_create([User(id=i, username='user%d' % i, email='user%d@yaas.com' % i,
+                                           password=password, date_joined=joined) for i in ids])
+            Language.objects.bulk_create([Language(user_id=i) for i in ids])
+
+
+def create_auctions(ids, bids, user_ids, seed, batch_size, write_lock=None):
+    """
+    Auctions with the given ids and `bids` bids spread randomly over them. Each auction is created in its final state,
+    with the highest bid, bidder and bid count of its generated history, so no row is written twice. `write_lock` is
+    held around every write when processes share a database that allows a single writer.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    first_user, last_user = user_ids[0], user_ids[-1]
+
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        # the bids of the whole range are shared out over the batches in proportion to their size
+        quota = bids * (start + len(batch)) // len(ids) - bids * start // len(ids)
+        counts = [0] * len(batch)
+        for i in range(quota):
+            counts[rng.randrange(len(batch))] += 1
+
+        auctions, history = [], []
+        for auction_id, count in zip(batch, counts):
+            seller = rng.randint(first_user, last_user)
+            price = rng.randint(100, 10000)
+            if first_user == last_user:
+                count = 0
+            # deadlines spread over the month after the 72 hour minimum
+            deadline_date = now + timezone.timedelta(hours=73, minutes=rng.randrange(60 * 24 * 30))
+            auction = AuctionModel(id=auction_id, seller_id=seller, title=rng.choice(WORDS),
+                                   description=' '.join(rng.choices(WORDS, k=rng.randint(8, 40))),
+                                   minimum_price=Money(price), highest_bid=Money(price), bid_count=count,
+                                   version=count, deadline_date=deadline_date)
+            for i in range(count):
+                # anyone but the seller
+                bidder = rng.randint(first_user, last_user - 1)
+                bidder = bidder + 1 if bidder >= seller else bidder
+                price += rng.randint(1, 500)
+                auction.highest_bid, auction.highest_bidder_id = Money(price), bidder
+                history.append(Bid(auction_id=auction_id, bidder_id=bidder, amount=Money(price), created_at=now))
+            auctions.append(auction)
+
+        with write_lock or nullcontext(), transaction.atomic():
+            AuctionModel.objects.bulk_create(auctions)
+            Bid.objects.bulk_create(history)
+
+
+def _create_shard(ids, bids, user_ids, seed, batch_size, write_lock):
+    try:
+        create_auctions(ids, bids, user_ids, seed, batch_size, write_lock)
+    finally:
+        connections.close_all()
+
+
+def generate(users, auctions, bids, seed=None, password=DEFAULT_PASSWORD, batch_size=5000, processes=1):
+    """
+    Generate `users` users, `auctions` auctions and `bids` bids, bids need at least two users. The same seed on an
+    empty database gives the same data. Returns the ranges of the new user and auction ids.
+    """
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    first_user, first_auction = _next_id(User), _next_id(AuctionModel)
+    user_ids = range(first_user, first_user + users)
+    auction_ids = range(first_auction, first_auction + auctions)
+
+    create_users(users, password, batch_size, first_user)
+
+    if processes <= 1:
+        create_auctions(auction_ids, bids, user_ids, seed, batch_size)
+    else:
+        # every process gets its own slice of the auction ids and its share of the bids, with SQLite they generate
+        # in parallel but take turns writing
+        context = multiprocessing.get_context('fork')
+        write_lock = context.Lock() if connection.vendor == 'sqlite' else None
+        connections.close_all()
+        shards = [context.Process(target=_create_shard, args=(
+            auction_ids[i::processes], bids * (i + 1) // processes - bids * i // processes, user_ids, seed + i,
+            batch_size, write_lock)) for i in range(processes)]
+        for shard in shards:
+            shard.start()
+        for shard in shards:
+            shard.join()
+        if any(shard.exitcode for shard in shards):
+            raise RuntimeError("A data generation process failed")
+
+    # explicit ids do not move the id sequences of databases that have them
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [User, Language, AuctionModel]):
+            cursor.execute(sql)
+
+    # bulk_create skips the signals that keep the search index and the change counter current
+    get_index().rebuild()
+    auctions_changed()
+    return user_ids, auction_ids
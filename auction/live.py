@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import socket
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# sent to the broker by every listening ASGI process, again every SUBSCRIBE_INTERVAL seconds
+SUBSCRIBE = b'subscribe'
+SUBSCRIBE_INTERVAL = 10
+
+# (event loop, Hub) of the ASGI apps running in this process
+_hubs = []
+_hubs_lock = threading.Lock()
+_socket = None
+
+
+def event(auction):
+    return {'auction': auction.id, 'highest_bid': float(auction.highest_bid), 'version': auction.version,
+            'status': auction.status}
+
+
+def listening():
+    """Whether anything receives the events of this process, writers can skip the work of publishing otherwise."""
+    return bool(settings.LIVE_EVENTS_BROKER or _hubs)
+
+
+def publish(*auctions):
+    """Send the state `auctions` have now to the streams following them once the current transaction commits."""
+    if not listening():
+        return
+    events = [event(auction) for auction in auctions]
+    transaction.on_commit(lambda: _send(events))
+
+
+def _send(events):
+    for loop, hub in list(_hubs):
+        try:
+            loop.call_soon_threadsafe(hub.publish, events)
+        except RuntimeError:
+            # the loop is closed, its app shut down without unregistering
+            unregister(hub)
+
+    if settings.LIVE_EVENTS_BROKER:
+        global _socket
+        if _socket is None:
+            _socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for auction_event in events:
+            try:
+                _socket.sendto(json.dumps(auction_event).encode(), tuple(settings.LIVE_EVENTS_BROKER))
+            except OSError:
+                logger.warning("Could not send the event of auction #%d to the broker", auction_event['auction'])
+
+
+def register(hub, loop):
+    with _hubs_lock:
+        _hubs.append((loop, hub))
+
+
+def unregister(hub):
+    with _hubs_lock:
+        _hubs[:] = [(loop, registered) for loop, registered in _hubs if registered is not hub]
+
+
+class Hub:
+    """
+    Fans the events of every auction out to the queues of the streams following it. Only touched from its event loop,
+    so thousands of idle streams cost a queue and a suspended coroutine each.
+    """
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self.streams = defaultdict(set)
+
+    def subscribe(self, auction_ids):
+        queue = asyncio.Queue(self.queue_size)
+        for auction_id in auction_ids:
+            self.streams[auction_id].add(queue)
+        return queue
+
+    def unsubscribe(self, queue, auction_ids):
+        for auction_id in auction_ids:
+            streams = self.streams.get(auction_id)
+            if streams is not None:
+                streams.discard(queue)
+                if not streams:
+                    del self.streams[auction_id]
+
+    def publish(self, events):
+        for auction_event in events:
+            for queue in self.streams.get(auction_event['auction'], ()):
+                # a client that fell behind only needs the latest state
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(auction_event)
+
+
+class BrokerListener(asyncio.DatagramProtocol):
+    def __init__(self, hub):
+        self.hub = hub
+
+    def datagram_received(self, data, addr):
+        try:
+            self.hub.publish([json.loads(data)])
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Dropped a malformed event from %s", addr)
+
+    def error_received(self, exc):
+        logger.warning("The event broker is unreachable: %s", exc)
+
+
+class EventBroker:
+    """
+    Local stand-in for a message broker between the processes that write auctions and the ASGI processes that stream
+    them: every event datagram is forwarded to the processes that subscribed within the last `timeout` seconds. Events
+    are not stored, a client that sees a gap in the versions of an auction reloads it.
+    """
+
+    def __init__(self, timeout=3 * SUBSCRIBE_INTERVAL):
+        self.timeout = timeout
+        self.subscribers = {}
+
+    def handle(self, data, addr, now=None):
+        """The addresses to forward the datagram `data` from `addr` to."""
+        now = time.monotonic() if now is None else now
+        if data == SUBSCRIBE:
+            self.subscribers[addr] = now
+            return []
+
+        self.subscribers = {subscriber: seen for subscriber, seen in self.subscribers.items()
+                            if now - seen < self.timeout}
+        return list(self.subscribers)
+
+    def serve(self, sock):
+        """Forward the datagrams arriving on the bound socket `sock` until it is shut down or closed."""
+        while True:
+            try:
+                data, addr = sock.recvfrom(65535)
+            except OSError:
+                return
+            # what a blocked receive returns once another thread shuts the socket down
+            if addr is None:
+                return
+            for subscriber in self.handle(data, addr):
+                try:
+                    sock.sendto(data, subscriber)
+                except OSError:
+                    self.subscribers.pop(subscriber, None)
+
+
+def auction_ids(query_string):
+    """The auction ids of ?auction=1&auction=2 or ?auction=1,2, None when one of them is not a number."""
+    try:
+        return sorted({int(value) for values in parse_qs(query_string).get('auction', [])
+                       for value in values.split(',') if value})
+    except ValueError:
+        return None
+
+
+class EventStreamApp:
+    """
+    ASGI application streaming the state of the auctions given in the query as Server-Sent Events at /events/, one
+    `auction` event with the highest bid, version and status whenever a bid, ban or resolve of one of them commits.
+    """
+
+    def __init__(self):
+        self.hub = None
+        self.transport = None
+        self.subscriber = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.start()
+            await self.handle(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def start(self):
+        if self.hub is not None:
+            return
+        loop = asyncio.get_event_loop()
+        self.hub = Hub(settings.LIVE_EVENTS_QUEUE_SIZE)
+        register(self.hub, loop)
+
+        if settings.LIVE_EVENTS_BROKER:
+            self.transport, _ = await loop.create_datagram_endpoint(
+                lambda: BrokerListener(self.hub), remote_addr=tuple(settings.LIVE_EVENTS_BROKER))
+            self.subscriber = asyncio.ensure_future(self.keep_subscribed())
+
+    async def keep_subscribed(self):
+        while True:
+            self.transport.sendto(SUBSCRIBE)
+            await asyncio.sleep(SUBSCRIBE_INTERVAL)
+
+    def stop(self):
+        if self.hub is None:
+            return
+        unregister(self.hub)
+        if self.subscriber:
+            self.subscriber.cancel()
+            self.transport.close()
+        self.hub = self.transport = self.subscriber = None
+
+    async def handle(self, scope, receive, send):
+        if scope['path'] != '/events/' or scope['method'] != 'GET':
+            return await self.respond(send, 404, b'Not found')
+
+        ids = auction_ids(scope['query_string'].decode('latin-1'))
+        if not ids or len(ids) > settings.LIVE_EVENTS_MAX_AUCTIONS:
+            return await self.respond(send, 400, b'Follow 1 to %d auctions with ?auction=<id>'
+                                      % settings.LIVE_EVENTS_MAX_AUCTIONS)
+
+        await self.stream(ids, receive, send)
+
+    async def respond(self, send, status, body):
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def stream(self, ids, receive, send):
+        hub = self.hub
+        queue = hub.subscribe(ids)
+        disconnected = asyncio.ensure_future(self.disconnect(receive))
+        next_event = None
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                # keeps proxies like nginx from buffering the stream
+                (b'x-accel-buffering', b'no')]})
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+
+            while True:
+                next_event = next_event or asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({next_event, disconnected}, timeout=settings.LIVE_EVENTS_HEARTBEAT,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    return
+                if next_event in done:
+                    auction_event, next_event = next_event.result(), None
+                    body = 'id: %d-%d\nevent: auction\ndata: %s\n\n' % (
+                        auction_event['auction'], auction_event['version'], json.dumps(auction_event))
+                else:
+                    body = ': keep-alive\n\n'
+                await send({'type': 'http.response.body', 'body': body.encode(), 'more_body': True})
+        finally:
+            hub.unsubscribe(queue, ids)
+            disconnected.cancel()
+            if next_event:
+                next_event.cancel()
+
+    @staticmethod
+    async def disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
@@ -0,0 +1,77 @@
+import threading
+import time
+from random import randint
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, OperationalError
+from django.utils import timezone
+
+from auction.bidding import place_bid, BidResult
+from auction.models import AuctionModel
+from auction.money import Money
+from auction.sequencer import BidSequencer
+
+
+class Command(BaseCommand):
+    help = 'Runs concurrent bidders against one hot auction and reports accepted bids per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--bids', type=int, default=200, help='bids attempted by each thread')
+        parser.add_argument('--sequencer', action='store_true', help='bid through the bid sequencer')
+
+    def handle(self, *args, **options):
+        stamp = str(int(time.time()))
+        seller = User.objects.create(username='bench_seller_' + stamp)
+        bidders = [User.objects.create(username='bench_bidder_%d_%s' % (i, stamp)) for i in range(options['threads'])]
+        auction = AuctionModel.objects.create(seller=seller, title='bench', description='bench', minimum_price=1,
+                                              highest_bid=1, deadline_date=timezone.now() + timezone.timedelta(days=1))
+
+        sequencer = None
+        if options['sequencer']:
+            sequencer = BidSequencer(settings.BID_SEQUENCER_THREADS, settings.BID_SEQUENCER_BATCH_SIZE,
+                                     settings.BID_SEQUENCER_CACHE_SIZE)
+        bid = sequencer.submit if sequencer else place_bid
+
+        counts = {status: 0 for status in (BidResult.ACCEPTED, BidResult.OUTBID, BidResult.CONFLICT, 'error')}
+        lock = threading.Lock()
+
+        def run(bidder):
+            local = dict.fromkeys(counts, 0)
+            try:
+                for i in range(options['bids']):
+                    current = AuctionModel.objects.values_list('highest_bid', flat=True).get(id=auction.id)
+                    try:
+                        result = bid(auction.id, bidder, current + Money(randint(1, 5)))
+                        local[result.status] = local.get(result.status, 0) + 1
+                    except OperationalError:
+                        local['error'] += 1
+            finally:
+                connection.close()
+            with lock:
+                for status, count in local.items():
+                    counts[status] = counts.get(status, 0) + count
+
+        threads = [threading.Thread(target=run, args=(bidder,)) for bidder in bidders]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if sequencer:
+            sequencer.stop()
+
+        auction.refresh_from_db()
+        self.stdout.write('threads: %d, attempts: %d, elapsed: %.2fs' % (
+            len(threads), len(threads) * options['bids'], elapsed))
+        for status, count in counts.items():
+            self.stdout.write('%s: %d' % (status, count))
+        self.stdout.write('settled bids/s: %.1f' % (len(threads) * options['bids'] / elapsed))
+        self.stdout.write('accepted bids/s: %.1f' % (counts[BidResult.ACCEPTED] / elapsed))
+        self.stdout.write('final version: %d, final bid: %.2f' % (auction.version, auction.highest_bid))
+
+        auction.delete()
+        User.objects.filter(id__in=[seller.id] + [bidder.id for bidder in bidders]).delete()
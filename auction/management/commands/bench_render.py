@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+
+from auction.cards import card_key, render_cards
+from auction.models import AuctionModel
+
+
+class Command(BaseCommand):
+    help = 'Compares rendering the auction list with a cold and a warm card cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=1000)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        deadline_date = timezone.now() + timezone.timedelta(days=5)
+        # unsaved auctions, the benchmark only measures template work
+        seller = User(id=1, username='seller')
+        auctions = [AuctionModel(id=i, seller=seller, title='item %d' % i, description='something ' * 20,
+                                 minimum_price=10, highest_bid=10 + i / 100, deadline_date=deadline_date)
+                    for i in range(1, options['cards'] + 1)]
+        for auction in auctions:
+            # what with_prices annotates when the auctions come from the database
+            auction.minimum_price_converted, auction.highest_bid_converted = auction.minimum_price, auction.highest_bid
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+
+        def render():
+            started = time.perf_counter()
+            render_to_string('index.html', {'auctions': auctions, 'cards': render_cards(request, auctions, 'eur'),
+                                            'currency': 'eur'}, request)
+            return (time.perf_counter() - started) * 1000
+
+        cache = caches['cards']
+        cold = []
+        for i in range(options['rounds']):
+            cache.clear()
+            cold.append(render())
+        # a warm number only means something when the cache kept every card of the page
+        hits = len(cache.get_many([card_key(auction, 'eur', False) for auction in auctions]))
+        warm = [render() for i in range(options['rounds'])]
+
+        for name, timings in (('cold', cold), ('warm', warm)):
+            self.stdout.write('%s cache: mean %.1fms, best %.1fms for %d cards' % (
+                name, statistics.mean(timings), min(timings), options['cards']))
+        self.stdout.write('warm hit rate: %.1f%%' % (100 * hits / len(auctions)))
+        cache.clear()
+        if hits < len(auctions):
+            raise CommandError("The card cache kept %d of %d cards, raise MAX_ENTRIES of CACHES['cards']" % (
+                hits, len(auctions)))
@@ -0,0 +1,72 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+
+from auction.models import AuctionModel
+from auction.search import get_index, search_auctions, FTS_TABLE, Fts5Index
+
+
+class Command(BaseCommand):
+    help = 'Compares search latency of the full-text index against the LIKE query on generated auctions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--auctions', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for i in range(rng.randint(4, 9)))
+                      for j in range(20000)]
+        seller = User.objects.create(username='bench_search_%d' % int(time.time()))
+        deadline_date = timezone.now() + timezone.timedelta(days=30)
+        first_id = (AuctionModel.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+        started = time.perf_counter()
+        for offset in range(0, options['auctions'], 5000):
+            AuctionModel.objects.bulk_create([
+                AuctionModel(id=first_id + offset + i, seller=seller,
+                             title=' '.join(rng.choice(vocabulary) for k in range(rng.randint(2, 6))),
+                             description=' '.join(rng.choice(vocabulary) for k in range(rng.randint(10, 40))),
+                             minimum_price=1, highest_bid=1, deadline_date=deadline_date)
+                for i in range(min(5000, options['auctions'] - offset))
+            ])
+        last_id = first_id + options['auctions'] - 1
+        get_index().rebuild()
+        self.stdout.write('generated and indexed %d auctions in %.1fs' % (options['auctions'],
+                                                                         time.perf_counter() - started))
+
+        try:
+            active = AuctionModel.objects.filter(status=AuctionModel.ACTIVE)
+            terms = [' '.join(rng.choice(vocabulary) for k in range(rng.randint(1, 2)))
+                     for i in range(options['queries'])]
+            like = self.measure(terms, lambda term: list(active.filter(title__contains=term.split()[0])))
+            indexed = self.measure(terms, lambda term: search_auctions(term, active, [AuctionModel.ACTIVE]))
+
+            for name, timings in (('LIKE', like), (get_index().__class__.__name__, indexed)):
+                self.stdout.write('%-14s mean %8.2fms  p50 %8.2fms  p95 %8.2fms' % (
+                    name, statistics.mean(timings), statistics.median(timings),
+                    sorted(timings)[int(len(timings) * 0.95) - 1]))
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('DELETE FROM %s WHERE id BETWEEN %%s AND %%s' % AuctionModel._meta.db_table,
+                               [first_id, last_id])
+                if isinstance(get_index(), Fts5Index):
+                    cursor.execute('DELETE FROM %s WHERE rowid BETWEEN %%s AND %%s' % FTS_TABLE, [first_id, last_id])
+            seller.delete()
+            if not isinstance(get_index(), Fts5Index):
+                get_index().rebuild()
+
+    def measure(self, terms, query):
+        timings = []
+        for term in terms:
+            started = time.perf_counter()
+            query(term)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auction.generator import generate, DEFAULT_PASSWORD
+
+
+class Command(BaseCommand):
+    help = 'Generates random users, auctions and bids for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--auctions', type=int, default=10000)
+        parser.add_argument('--bids', type=int, default=100000)
+        parser.add_argument('--seed', type=int, help='the same seed on an empty database gives the same data')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='password of every generated user')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--processes', type=int, default=1, help='processes, each creating its share of auctions')
+
+    def handle(self, *args, **options):
+        if options['auctions'] and not options['users']:
+            raise CommandError('Auctions need at least one user to sell them')
+
+        started = time.perf_counter()
+        user_ids, auction_ids = generate(options['users'], options['auctions'], options['bids'], seed=options['seed'],
+                                         password=options['password'], batch_size=options['batch_size'],
+                                         processes=options['processes'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write('generated users %d-%d and auctions %d-%d with %d bids in %.1fs' % (
+            user_ids[0] if user_ids else 0, user_ids[-1] if user_ids else 0,
+            auction_ids[0] if auction_ids else 0, auction_ids[-1] if auction_ids else 0, options['bids'], elapsed))
@@ -0,0 +1,249 @@
+import json
+import math
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import requests
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from auction.generator import WORDS
+from auction.models import AuctionModel
+from auction.money import Money
+
+DEFAULT_MIX = 'index=30,search=20,browse=20,searchid=15,bid=10,api_bid=5'
+PASSWORD = 'loadtest'
+
+
+class InProcessClient:
+    """Requests go straight into the WSGI handler of this process, mail is not sent."""
+
+    def __init__(self, username):
+        self.client = Client(SERVER_NAME='localhost')
+        self.client.login(username=username, password=PASSWORD)
+        token = self.client.post(reverse('tokenapi'), {'username': username, 'password': PASSWORD}).json()['token']
+        self.authorization = 'Token ' + token
+
+    def get(self, path, params=None):
+        return self._status(self.client.get, path, params)
+
+    def post(self, path, data, api=False):
+        if api:
+            return self._status(self.client.post, path, data, HTTP_AUTHORIZATION=self.authorization)
+        return self._status(self.client.post, path, data)
+
+    @staticmethod
+    def _status(method, *args, **kwargs):
+        # the test client re-raises what the view raised, a server would have answered with a 500
+        try:
+            return method(*args, **kwargs).status_code
+        except Exception:
+            return 500
+
+
+class LiveClient:
+    """Requests go to a running server over one keep-alive session per worker."""
+
+    def __init__(self, url, username):
+        self.url = url.rstrip('/')
+        self.session = requests.Session()
+        self.session.get(self.url + reverse('signin'))
+        self.session.post(self.url + reverse('signin'), {
+            'username': username, 'password': PASSWORD, 'csrfmiddlewaretoken': self.session.cookies.get('csrftoken')
+        })
+        token = self.session.post(self.url + reverse('tokenapi'), {'username': username, 'password': PASSWORD})
+        self.authorization = 'Token ' + token.json()['token']
+
+    def get(self, path, params=None):
+        return self.session.get(self.url + path, params=params).status_code
+
+    def post(self, path, data, api=False):
+        if api:
+            return self.session.post(self.url + path, data, headers={'Authorization': self.authorization}).status_code
+        return self.session.post(self.url + path, data,
+                                 headers={'X-CSRFToken': self.session.cookies.get('csrftoken', '')}).status_code
+
+
+def percentile(timings, p):
+    """Nearest-rank percentile of sorted `timings`."""
+    return timings[max(0, math.ceil(p / 100 * len(timings)) - 1)]
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ENDPOINTS:
+            raise CommandError("Unknown endpoint '%s', use %s" % (name, ', '.join(ENDPOINTS)))
+        weights[name] = int(weight or 1)
+    return weights
+
+
+def _bid_amount(started):
+    # grows 1000.00 per second, concurrent bids in the same millisecond are outbid like in a real auction
+    return str(Money(100 + int((time.time() - started) * 100000)))
+
+
+def _index(client, targets, rng):
+    return client.get(reverse('index'))
+
+
+def _search(client, targets, rng):
+    return client.get(reverse('auction:search'), {'term': rng.choice(WORDS)})
+
+
+def _browse(client, targets, rng):
+    return client.get(reverse('browseauctionsapi'))
+
+
+def _searchid(client, targets, rng):
+    return client.get(reverse('searchauctionbyidapi', args=(rng.choice(targets['auctions']),)))
+
+
+def _bid(client, targets, rng):
+    return client.post(reverse('auction:bid', args=(rng.choice(targets['hot']),)),
+                       {'new_price': _bid_amount(targets['started'])})
+
+
+def _api_bid(client, targets, rng):
+    return client.post(reverse('bidauctionapi', args=(rng.choice(targets['hot']),)),
+                       {'new_price': _bid_amount(targets['started'])}, api=True)
+
+
+ENDPOINTS = {
+    'index': _index,
+    'search': _search,
+    'browse': _browse,
+    'searchid': _searchid,
+    'bid': _bid,
+    'api_bid': _api_bid
+}
+
+
+def run_worker(worker, count, weights, targets, url, seed):
+    """Send `count` requests picked by `weights`, returns (endpoint, milliseconds, status) for each of them."""
+    rng = random.Random(seed + worker)
+    username = targets['bidders'][worker % len(targets['bidders'])]
+    names, cumulative = list(weights), list(weights.values())
+    samples = []
+    try:
+        client = LiveClient(url, username) if url else InProcessClient(username)
+        for i in range(count):
+            name = rng.choices(names, cumulative)[0]
+            started = time.perf_counter()
+            try:
+                status = ENDPOINTS[name](client, targets, rng)
+            except requests.RequestException:
+                status = 0
+            samples.append((name, (time.perf_counter() - started) * 1000, status))
+    finally:
+        connections.close_all()
+    return samples
+
+
+class Command(BaseCommand):
+    help = 'Drives concurrent clients against the core endpoints, reports throughput and latency percentiles as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='base url of a running server, the WSGI app is called in-process otherwise')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=2000, help='requests over all clients')
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint=weight pairs, of %s' % ', '.join(ENDPOINTS))
+        parser.add_argument('--hot-auctions', type=int, default=3, help='auctions all the bids go to')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='also write the JSON report to this file')
+        parser.add_argument('--baseline', help='JSON report of an earlier run to compare p95 latencies with')
+
+    def handle(self, *args, **options):
+        weights = parse_mix(options['mix'])
+        concurrency = options['concurrency']
+        self.teardown()
+        targets = self.setup(options['hot_auctions'], concurrency)
+
+        counts = [options['requests'] * (i + 1) // concurrency - options['requests'] * i // concurrency
+                  for i in range(concurrency)]
+        if options['pool'] == 'process':
+            connections.close_all()
+            executor = ProcessPoolExecutor(concurrency, mp_context=multiprocessing.get_context('fork'))
+        else:
+            executor = ThreadPoolExecutor(concurrency)
+
+        try:
+            # bids would send mail to the generated users
+            with override_settings(EMAIL_BACKEND='django.core.mail.backends.dummy.EmailBackend'), executor:
+                started = time.perf_counter()
+                futures = [executor.submit(run_worker, i, counts[i], weights, targets, options['url'],
+                                           options['seed']) for i in range(concurrency)]
+                samples = [sample for future in futures for sample in future.result()]
+                elapsed = time.perf_counter() - started
+        finally:
+            self.teardown()
+        report = self.report(samples, elapsed, options)
+
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        if options['baseline']:
+            self.compare(report, options['baseline'])
+
+    def setup(self, hot_auctions, concurrency):
+        seller = User.objects.create_user('loadtest_seller', password=PASSWORD)
+        bidders = [User.objects.create_user('loadtest_bidder%d' % i, password=PASSWORD).username
+                   for i in range(min(concurrency, 16))]
+        deadline_date = timezone.now() + timezone.timedelta(days=5)
+        hot = [AuctionModel.objects.create(seller=seller, title='loadtest', description='loadtest', minimum_price=1,
+                                           highest_bid=1, deadline_date=deadline_date).id
+               for i in range(hot_auctions)]
+        auctions = list(AuctionModel.objects.filter(status=AuctionModel.ACTIVE).values_list('id', flat=True)[:1000])
+        return {'hot': hot, 'auctions': auctions, 'bidders': bidders, 'started': time.time()}
+
+    def teardown(self):
+        seller = User.objects.filter(username='loadtest_seller').first()
+        if seller:
+            AuctionModel.objects.filter(seller=seller).delete()
+        User.objects.filter(username__startswith='loadtest_').delete()
+
+    def report(self, samples, elapsed, options):
+        endpoints = {}
+        for name in sorted({sample[0] for sample in samples}):
+            timings = sorted(sample[1] for sample in samples if sample[0] == name)
+            statuses = [sample[2] for sample in samples if sample[0] == name]
+            endpoints[name] = {
+                'requests': len(timings),
+                'errors': sum(1 for status in statuses if status == 0 or status >= 500),
+                'throughput': round(len(timings) / elapsed, 1),
+                'mean_ms': round(sum(timings) / len(timings), 2),
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'p99_ms': round(percentile(timings, 99), 2),
+                'max_ms': round(timings[-1], 2)
+            }
+
+        return {
+            'target': options['url'] or 'in-process',
+            'pool': options['pool'],
+            'concurrency': options['concurrency'],
+            'mix': options['mix'],
+            'seconds': round(elapsed, 2),
+            'requests': len(samples),
+            'throughput': round(len(samples) / elapsed, 1),
+            'endpoints': endpoints
+        }
+
+    def compare(self, report, baseline):
+        with open(baseline) as f:
+            before = json.load(f)['endpoints']
+        for name, stats in report['endpoints'].items():
+            if name in before:
+                self.stderr.write('%-10s p95 %8.2fms -> %8.2fms (%+.0f%%)' % (
+                    name, before[name]['p95_ms'], stats['p95_ms'],
+                    (stats['p95_ms'] / before[name]['p95_ms'] - 1) * 100))
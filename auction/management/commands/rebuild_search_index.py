@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from auction.search import get_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index from the auctions table'
+
+    def handle(self, *args, **options):
+        index = get_index()
+        index.rebuild()
+        self.stdout.write('rebuilt %s' % index.__class__.__name__)
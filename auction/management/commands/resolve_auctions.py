@@ -0,0 +1,51 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from auction.resolver import resolve_expired
+
+
+def _resolve_shard(chunk_size, shard, results):
+    resolved = None
+    try:
+        resolved = sum(len(chunk) for chunk in resolve_expired(chunk_size=chunk_size, shard=shard))
+    finally:
+        # None marks a failed shard, the parent would wait for its count forever otherwise
+        results.put(resolved)
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Resolves every active auction whose deadline has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=1, help='processes, each resolving its own share of ids')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        workers = options['workers']
+
+        if workers <= 1:
+            resolved = sum(len(chunk) for chunk in resolve_expired(chunk_size=options['chunk_size']))
+        else:
+            context = multiprocessing.get_context('fork')
+            results = context.Queue()
+            connections.close_all()
+            processes = [context.Process(target=_resolve_shard, args=(options['chunk_size'], (workers, i), results))
+                         for i in range(workers)]
+            for process in processes:
+                process.start()
+            counts = [results.get() for process in processes]
+            for process in processes:
+                process.join()
+            failed = sum(1 for count, process in zip(counts, processes) if count is None or process.exitcode)
+            if failed:
+                raise CommandError("%d of %d workers failed, the auctions they did not resolve are still due"
+                                   % (failed, workers))
+            resolved = sum(counts)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write('resolved %d auctions in %.2fs (%.1f/s)' % (resolved, elapsed, resolved / elapsed))
@@ -0,0 +1,24 @@
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from auction.live import EventBroker
+
+
+class Command(BaseCommand):
+    help = 'Forwards the live bid updates of every process to the ASGI processes streaming them (LIVE_EVENTS_BROKER)'
+
+    def handle(self, *args, **options):
+        if not settings.LIVE_EVENTS_BROKER:
+            raise CommandError('Set LIVE_EVENTS_BROKER to the (host, port) the broker listens on')
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(tuple(settings.LIVE_EVENTS_BROKER))
+        self.stdout.write('Forwarding events on %s:%d' % tuple(settings.LIVE_EVENTS_BROKER))
+        try:
+            EventBroker().serve(sock)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sock.close()
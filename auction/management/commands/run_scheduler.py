@@ -0,0 +1,42 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from auction.scheduler import DeadlineScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Resolves auctions as their deadlines pass'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon', type=int, default=3600, help='seconds of upcoming deadlines kept in memory')
+        parser.add_argument('--poll', type=float, default=5.0, help='maximum seconds between two ticks')
+
+    def handle(self, *args, **options):
+        scheduler = DeadlineScheduler(horizon=timezone.timedelta(seconds=options['horizon']))
+
+        try:
+            while True:
+                try:
+                    for auction in scheduler.tick():
+                        self.stdout.write('resolved auction #%d' % auction['id'])
+                except Exception:
+                    # the auctions that were not resolved stay due, the next tick tries them again
+                    logger.exception("Resolving auctions failed")
+                    connections.close_all()
+
+                # sleep until the next deadline, but wake up in time to pick up new auctions and extend the window
+                wait = options['poll']
+                next_deadline = scheduler.next_deadline()
+                if next_deadline is not None:
+                    wait = min(wait, max((next_deadline - timezone.now()).total_seconds(), 0))
+                time.sleep(wait)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connections.close_all()
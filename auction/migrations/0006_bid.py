@@ -0,0 +1,70 @@
+# Generated by Django 2.2.13 on 2026-10-18 14:54
+
+import json
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def bidders_to_bids(apps, schema_editor):
+    # the JSON column only kept bidder ids: the last one holds the highest bid, older amounts are not recoverable and
+    # are recorded as the minimum price
+    AuctionModel = apps.get_model('auction', 'AuctionModel')
+    Bid = apps.get_model('auction', 'Bid')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    user_ids = set(User.objects.values_list('id', flat=True))
+
+    for auction in AuctionModel.objects.exclude(bidders='[]').iterator():
+        bidders = [user_id for user_id in json.loads(auction.bidders) if user_id in user_ids]
+        Bid.objects.bulk_create([
+            Bid(auction_id=auction.id, bidder_id=user_id,
+                amount=auction.highest_bid if i == len(bidders) - 1 else auction.minimum_price)
+            for i, user_id in enumerate(bidders)
+        ])
+        AuctionModel.objects.filter(id=auction.id).update(bid_count=len(bidders))
+
+
+def bids_to_bidders(apps, schema_editor):
+    AuctionModel = apps.get_model('auction', 'AuctionModel')
+    Bid = apps.get_model('auction', 'Bid')
+
+    for auction in AuctionModel.objects.filter(bid_count__gt=0).iterator():
+        bidders = list(Bid.objects.filter(auction_id=auction.id).order_by('id').values_list('bidder_id', flat=True))
+        AuctionModel.objects.filter(id=auction.id).update(bidders=json.dumps(bidders))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auction', '0005_auctionmodel_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auctionmodel',
+            name='bid_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Bid',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.FloatField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('auction', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='bids', to='auction.AuctionModel')),
+                ('bidder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bids', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['auction', 'amount'], name='auction_bid_auction_5dafc2_idx'),
+        ),
+        migrations.RunPython(bidders_to_bids, bids_to_bidders),
+        migrations.RemoveField(
+            model_name='auctionmodel',
+            name='bidders',
+        ),
+    ]
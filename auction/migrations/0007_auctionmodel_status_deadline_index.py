@@ -0,0 +1,17 @@
+# Generated by Django 2.2.13 on 2026-10-18 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0006_bid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auctionmodel',
+            index=models.Index(fields=['status', 'deadline_date'], name='auction_auc_status_ffb2ea_idx'),
+        ),
+    ]
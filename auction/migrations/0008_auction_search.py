@@ -0,0 +1,29 @@
+from django.db import migrations, OperationalError
+
+
+def create_search_table(apps, schema_editor):
+    # without FTS5 the search falls back to an in-process index
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute('CREATE VIRTUAL TABLE auction_search USING fts5(title, description)')
+    except OperationalError:
+        return
+    schema_editor.execute('INSERT INTO auction_search (rowid, title, description) '
+                          'SELECT id, title, description FROM auction_auctionmodel')
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS auction_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0007_auctionmodel_status_deadline_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
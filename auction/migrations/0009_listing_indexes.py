@@ -0,0 +1,25 @@
+# Generated by Django 2.2.13 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0008_auction_search'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auctionmodel',
+            name='auction_auc_status_ffb2ea_idx',
+        ),
+        migrations.AddIndex(
+            model_name='auctionmodel',
+            index=models.Index(fields=['status', 'deadline_date', 'id'], name='auction_auc_status_622267_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auctionmodel',
+            index=models.Index(fields=['deadline_date', 'id'], name='auction_auc_deadlin_80f067_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.13 on 2026-10-18 15:10
+
+import auction.money
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Round
+
+
+def to_cents(apps, schema_editor):
+    # runs while the columns are still floats, the integer columns then take the rounded values as they are
+    AuctionModel = apps.get_model('auction', 'AuctionModel')
+    Bid = apps.get_model('auction', 'Bid')
+    AuctionModel.objects.update(minimum_price=Round(F('minimum_price') * 100),
+                                highest_bid=Round(F('highest_bid') * 100))
+    Bid.objects.update(amount=Round(F('amount') * 100))
+
+
+def to_units(apps, schema_editor):
+    AuctionModel = apps.get_model('auction', 'AuctionModel')
+    Bid = apps.get_model('auction', 'Bid')
+    AuctionModel.objects.update(minimum_price=F('minimum_price') / 100.0, highest_bid=F('highest_bid') / 100.0)
+    Bid.objects.update(amount=F('amount') / 100.0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0009_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_cents, to_units),
+        migrations.AlterField(
+            model_name='auctionmodel',
+            name='highest_bid',
+            field=auction.money.MoneyField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='auctionmodel',
+            name='minimum_price',
+            field=auction.money.MoneyField(),
+        ),
+        migrations.AlterField(
+            model_name='bid',
+            name='amount',
+            field=auction.money.MoneyField(),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 2.2.13 on 2026-10-18 15:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def to_null(apps, schema_editor):
+    # -1 meant no bidder, and ids of removed users would break the foreign key constraint
+    AuctionModel = apps.get_model('auction', 'AuctionModel')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    users = User.objects.values('id')
+    AuctionModel.objects.exclude(highest_bidder__in=users).update(highest_bidder=None)
+    AuctionModel.objects.exclude(seller__in=users).update(seller=None)
+
+
+def to_sentinel(apps, schema_editor):
+    AuctionModel = apps.get_model('auction', 'AuctionModel')
+    AuctionModel.objects.filter(highest_bidder=None).update(highest_bidder=-1)
+    AuctionModel.objects.filter(seller=None).update(seller=-1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auction', '0010_money_cents'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='auctionmodel',
+            name='highest_bidder',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='auctionmodel',
+            name='seller',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.RunPython(to_null, to_sentinel),
+        migrations.AlterField(
+            model_name='auctionmodel',
+            name='highest_bidder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leading_auctions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='auctionmodel',
+            name='seller',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='auctions', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
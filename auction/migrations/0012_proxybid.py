@@ -0,0 +1,36 @@
+# Generated by Django 2.2.13 on 2026-10-18 15:38
+
+import auction.money
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('auction', '0011_user_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProxyBid',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('maximum', auction.money.MoneyField()),
+                ('placed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('auction', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='proxy_bids', to='auction.AuctionModel')),
+                ('bidder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proxy_bids', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='proxybid',
+            index=models.Index(fields=['auction', '-maximum', 'placed_at'], name='auction_pro_auction_ac6ad2_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='proxybid',
+            constraint=models.UniqueConstraint(fields=('auction', 'bidder'), name='unique_proxy_bid'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.13 on 2026-10-18 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auction', '0012_proxybid'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['auction', 'created_at', 'amount'], name='auction_bid_auction_83fc6b_idx'),
+        ),
+    ]
@@ -1,4 +1,8 @@
+from django.contrib.auth.models import User
 from django.db import models
+from django.utils import timezone
+
+from auction.money import MoneyField
 
 
 class AuctionModel(models.Model):
@@ -12,13 +16,49 @@ class AuctionModel(models.Model):
         (DUE, 'Due'),
         (ADJUDECATED, 'Adjudecated')
     ]
-    seller = models.IntegerField()
+    # both survive the removal of the user, like the plain ids did before
+    seller = models.ForeignKey(User, null=True, on_delete=models.SET_NULL, related_name='auctions')
     title = models.CharField(max_length=256)
     description = models.TextField(max_length=3000)
-    minimum_price = models.FloatField()
+    minimum_price = MoneyField()
     deadline_date = models.DateTimeField()
     status = models.CharField(max_length=12, choices=STATUSES, default=ACTIVE)
-    highest_bid = models.FloatField(default=0)
-    highest_bidder = models.IntegerField(default=-1)
-    bidders = models.TextField(default="[]")
+    highest_bid = MoneyField(default=0)
+    highest_bidder = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL,
+                                       related_name='leading_auctions')
+    bid_count = models.IntegerField(default=0)
     version = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'deadline_date', 'id']),
+            models.Index(fields=['deadline_date', 'id'])
+        ]
+
+
+class Bid(models.Model):
+    # (auction, amount) below already serves lookups by auction
+    auction = models.ForeignKey(AuctionModel, on_delete=models.CASCADE, related_name='bids', db_index=False)
+    bidder = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bids')
+    amount = MoneyField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['auction', 'amount']),
+            # the bid history in page order, the row id every SQLite index ends with breaks the remaining ties
+            models.Index(fields=['auction', 'created_at', 'amount'])
+        ]
+
+
+class ProxyBid(models.Model):
+    # the most the bidder pays for the auction, auction.bidding.settle_proxies bids up to it for them
+    auction = models.ForeignKey(AuctionModel, on_delete=models.CASCADE, related_name='proxy_bids', db_index=False)
+    bidder = models.ForeignKey(User, on_delete=models.CASCADE, related_name='proxy_bids')
+    maximum = MoneyField()
+    placed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['auction', 'bidder'], name='unique_proxy_bid')]
+        # the two highest maximums of an auction, the earlier first on a tie, are the first two entries of its range
+        indexes = [models.Index(fields=['auction', '-maximum', 'placed_at'])]
@@ -0,0 +1,116 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import total_ordering
+
+from django import forms
+from django.db import models
+
+CENT = Decimal('0.01')
+# the most a MoneyField, a BIGINT column, holds
+MAX_CENTS = 2 ** 63 - 1
+
+
+@total_ordering
+class Money:
+    """
+    An amount of the base currency kept as integer cents. Plain numbers it is compared or combined with are read as
+    whole currency units, so Money.parse('12.5') == 12.5 and the arithmetic stays on integers.
+    """
+
+    __slots__ = ('cents',)
+
+    def __init__(self, cents):
+        self.cents = int(cents)
+
+    @classmethod
+    def parse(cls, value):
+        """Money from a number or a string of whole units, rounded to the cent. Raises ValueError when it is not one."""
+        if isinstance(value, Money):
+            return value
+        try:
+            amount = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError("'%s' is not an amount of money" % value)
+        if not amount.is_finite():
+            raise ValueError("'%s' is not an amount of money" % value)
+        try:
+            cents = amount.quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2)
+        except InvalidOperation:
+            # more digits than the decimal context holds
+            raise ValueError("'%s' is too large an amount of money" % value)
+        if abs(cents) > MAX_CENTS:
+            raise ValueError("'%s' is too large an amount of money" % value)
+        return cls(cents)
+
+    @property
+    def amount(self):
+        return Decimal(self.cents).scaleb(-2)
+
+    def __add__(self, other):
+        return Money(self.cents + Money.parse(other).cents)
+
+    def __sub__(self, other):
+        return Money(self.cents - Money.parse(other).cents)
+
+    def __eq__(self, other):
+        try:
+            return self.cents == Money.parse(other).cents
+        except (ValueError, TypeError):
+            return NotImplemented
+
+    def __lt__(self, other):
+        return self.cents < Money.parse(other).cents
+
+    def __hash__(self):
+        return hash(self.amount)
+
+    def __float__(self):
+        return self.cents / 100
+
+    def __str__(self):
+        return str(self.amount)
+
+    def __repr__(self):
+        return 'Money(%s)' % self
+
+
+class MoneyField(models.BigIntegerField):
+    """Stores Money as integer cents, plain numbers assigned to it are whole units."""
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else Money(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Money):
+            return value
+        return Money.parse(value)
+
+    def get_prep_value(self, value):
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return Money.parse(value).cents
+
+    def formfield(self, **kwargs):
+        return super().formfield(**{'form_class': MoneyFormField, **kwargs})
+
+
+class MoneyFormField(forms.DecimalField):
+    def __init__(self, **kwargs):
+        kwargs.setdefault('decimal_places', 2)
+        kwargs.pop('max_value', None)
+        kwargs.pop('min_value', None)
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        value = super().to_python(value)
+        if value is None:
+            return None
+        try:
+            return Money.parse(value)
+        except ValueError:
+            raise forms.ValidationError(self.error_messages['invalid'], code='invalid')
+
+    def validate(self, value):
+        super().validate(None if value is None else value.amount)
+
+    def run_validators(self, value):
+        super().run_validators(None if value is None else value.amount)
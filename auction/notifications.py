@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+
+from metrics.registry import timed
+
+# stays below SQLite's limit on query parameters
+ID_CHUNK_SIZE = 900
+
+
+def notify_users(user_ids, subject, message):
+    """
+    Send the same message to every distinct user in `user_ids`. Addresses are looked up with id__in queries and the
+    messages go out over one mail connection in batches of NOTIFICATION_BATCH_SIZE.
+    """
+    return notify_many([(user_ids, subject, message)])
+
+
+def notify_many(notifications):
+    """
+    Send every (user_ids, subject, message) of `notifications` like notify_users, with a single address lookup for
+    all of them.
+    """
+    # None stands for a removed user
+    user_ids = sorted({user_id for ids, subject, message in notifications for user_id in ids} - {None})
+    emails = {}
+    for i in range(0, len(user_ids), ID_CHUNK_SIZE):
+        emails.update(User.objects.filter(id__in=user_ids[i:i + ID_CHUNK_SIZE]).exclude(email='')
+                      .values_list('id', 'email'))
+
+    messages = [EmailMessage(subject, message, 'yaas-no-reply@yaas.com', [emails[user_id]])
+                for ids, subject, message in notifications
+                for user_id in sorted(set(ids) - {None}) if user_id in emails]
+    batch_size = settings.NOTIFICATION_BATCH_SIZE
+
+    with timed('mail', 'notify_users'), get_connection() as connection:
+        for i in range(0, len(messages), batch_size):
+            connection.send_messages(messages[i:i + batch_size])
+
+    return len(messages)
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from auction.money import Money
+
+NEXT = 'n'
+PREV = 'p'
+# the keys of the cursors of paginate_ranked, which hold a position instead of column values
+RANKED = ('ranked',)
+
+
+class Page:
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next = next_cursor
+        self.prev = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('page_size', settings.PAGE_SIZE))
+    except ValueError:
+        size = settings.PAGE_SIZE
+    return max(1, min(size, settings.MAX_PAGE_SIZE))
+
+
+def _encode_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    # whole units, which is what MoneyField.to_python reads back
+    return str(value) if isinstance(value, Money) else value
+
+
+def _salt(keys):
+    # a cursor only opens on lists ordered the same way, one taken to another endpoint is a tampered one there
+    return 'auction.pagination:' + ','.join(keys)
+
+
+def encode_cursor(direction, values, keys):
+    return signing.dumps([direction] + [_encode_value(value) for value in values], salt=_salt(keys), compress=True)
+
+
+def decode_cursor(cursor, keys):
+    """
+    (direction, values) of a cursor made for the ordering `keys`, or None for a missing, tampered or foreign one so the
+    first page is served.
+    """
+    if not cursor:
+        return None
+    try:
+        decoded = signing.loads(cursor, salt=_salt(keys))
+    except signing.BadSignature:
+        return None
+    if not isinstance(decoded, list) or len(decoded) != len(keys) + 1 or decoded[0] not in (NEXT, PREV):
+        return None
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in decoded[1:]):
+        return None
+    return decoded[0], decoded[1:]
+
+
+def _after(keys, values, descending=False):
+    # (k1, k2) > (v1, v2) spelled out, with a redundant k1 >= v1 so the index can seek straight to the cursor
+    op = 'lt' if descending else 'gt'
+    condition = Q()
+    for i in range(len(keys) - 1, -1, -1):
+        term = Q(**{'%s__%s' % (keys[i], op): values[i]})
+        condition = term if i == len(keys) - 1 else term | (Q(**{keys[i]: values[i]}) & condition)
+    return Q(**{'%s__%se' % (keys[0], op): values[0]}) & condition
+
+
+def paginate(queryset, cursor=None, size=None, keys=('deadline_date', 'id')):
+    """
+    Keyset pagination of `queryset` ordered by `keys`. Every page is a range scan starting right after (or before) the
+    cursor position, so deep pages cost as much as the first one.
+    """
+    size = size or settings.PAGE_SIZE
+    decoded = decode_cursor(cursor, keys)
+    if decoded:
+        try:
+            values = [queryset.model._meta.get_field(key).to_python(value) for key, value in zip(keys, decoded[1])]
+        except (ValidationError, ValueError, TypeError):
+            decoded = None
+    direction = decoded[0] if decoded else NEXT
+
+    if decoded:
+        queryset = queryset.filter(_after(keys, values, descending=direction == PREV))
+
+    if direction == PREV:
+        queryset = queryset.order_by(*['-' + key for key in keys])
+    else:
+        queryset = queryset.order_by(*keys)
+
+    items = list(queryset[:size + 1])
+    has_more = len(items) > size
+    items = items[:size]
+    if direction == PREV:
+        items.reverse()
+
+    if not items:
+        return Page(items)
+
+    first = [getattr(items[0], key) for key in keys]
+    last = [getattr(items[-1], key) for key in keys]
+    next_cursor = encode_cursor(NEXT, last, keys) if has_more or direction == PREV else None
+    prev_cursor = encode_cursor(PREV, first, keys) if decoded and (has_more or direction == NEXT) else None
+    return Page(items, next_cursor, prev_cursor)
+
+
+def paginate_ranked(ids, cursor=None, size=None):
+    """Pagination of an already ranked id list, the cursor holds the position in the ranking."""
+    size = size or settings.PAGE_SIZE
+    decoded = decode_cursor(cursor, RANKED)
+    start = 0
+    if decoded and isinstance(decoded[1][0], int) and decoded[1][0] >= 0:
+        direction, (position,) = decoded
+        start = position if direction == NEXT else max(position - size, 0)
+
+    end = start + size
+    next_cursor = encode_cursor(NEXT, [end], RANKED) if end < len(ids) else None
+    prev_cursor = encode_cursor(PREV, [start], RANKED) if start > 0 else None
+    return Page(ids[start:end], next_cursor, prev_cursor)
@@ -0,0 +1,104 @@
+import logging
+import threading
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from metrics.registry import timed
+from tasks.queue import enqueue
+
+logger = logging.getLogger(__name__)
+
+RATES_KEY = 'exchange_rates'
+LAST_RATES_KEY = 'exchange_rates:last'
+REFRESH_LOCK_KEY = 'exchange_rates:refreshing'
+
+_session = None
+
+
+def get_session():
+    """One pooled HTTP session per process, so refreshes reuse the provider connection."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        _session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=4, max_retries=1))
+        _session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=4, max_retries=1))
+    return _session
+
+
+class CurrencyLayerProvider:
+    """Quotes from the currencylayer API configured in CURRENCY_API."""
+
+    def fetch(self):
+        with timed('http', 'currencylayer'):
+            response = get_session().get(settings.CURRENCY_API, timeout=settings.EXCHANGE_RATE_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+        if not data.get('success', True) or 'quotes' not in data:
+            raise ValueError("Exchange rate provider answered with an error: %s" % data.get('error'))
+        return data['quotes']
+
+
+class StubProvider:
+    """Fixed quotes, used without CURRENCY_API while developing and in tests."""
+
+    QUOTES = {'USDEUR': 0.9, 'USDGBP': 0.8, 'USDSEK': 9.6}
+
+    def fetch(self):
+        return dict(self.QUOTES)
+
+
+def get_provider():
+    """The EXCHANGE_RATE_PROVIDER, None when there is none."""
+    if not settings.EXCHANGE_RATE_PROVIDER:
+        return None
+    return import_string(settings.EXCHANGE_RATE_PROVIDER)()
+
+
+def refresh_rates():
+    """
+    Fetch the quotes from the provider and store them for EXCHANGE_RATE_TTL seconds. A failing provider leaves the last
+    known quotes in place, returns the quotes now in the cache. Without a provider there are none.
+    """
+    try:
+        provider = get_provider()
+        if provider is None:
+            return None
+        quotes = provider.fetch()
+    except (requests.RequestException, ValueError):
+        logger.warning("Could not refresh exchange rates, keeping the last known ones", exc_info=True)
+        quotes = cache.get(LAST_RATES_KEY)
+    else:
+        cache.set(RATES_KEY, quotes, settings.EXCHANGE_RATE_TTL)
+        cache.set(LAST_RATES_KEY, quotes, None)
+    finally:
+        cache.delete(REFRESH_LOCK_KEY)
+    return quotes
+
+
+def get_quotes():
+    """
+    The USD based provider quotes, answered from the cache. Once they are older than EXCHANGE_RATE_TTL the last known
+    ones are still served and a single background refresh is queued, or started in a thread with TASK_QUEUE_EAGER.
+    Only a cold cache waits for the provider.
+    Returns None when no quotes were ever fetched.
+    """
+    quotes = cache.get(RATES_KEY)
+    if quotes is None:
+        quotes = cache.get(LAST_RATES_KEY)
+        if quotes is None:
+            quotes = refresh_rates()
+        elif cache.add(REFRESH_LOCK_KEY, True, settings.EXCHANGE_RATE_TTL):
+            _refresh_in_background()
+    return quotes
+
+
+def _refresh_in_background():
+    if settings.TASK_QUEUE_EAGER:
+        # no worker drains the queue in eager mode, and the request must not wait for the provider
+        threading.Thread(target=refresh_rates, name='refresh-rates', daemon=True).start()
+    else:
+        enqueue('auction.refresh_rates', run_at=timezone.now())
@@ -0,0 +1,63 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from auction.etags import auctions_changed
+from auction.live import listening, publish
+from auction.models import AuctionModel, Bid
+from auction.tasks import queue_notifications
+
+
+def expired_auctions(now=None, shard=None):
+    """Active auctions past their deadline, served by the (status, deadline_date) index."""
+    auctions = AuctionModel.objects.filter(status=AuctionModel.ACTIVE, deadline_date__lt=now or timezone.now())
+    if shard is not None:
+        workers, index = shard
+        auctions = auctions.annotate(shard=F('id') % workers).filter(shard=index)
+    return auctions.order_by('deadline_date', 'id')
+
+
+def resolve_expired(now=None, chunk_size=500, shard=None):
+    """
+    Resolve expired auctions in chunks of `chunk_size`, yielding the resolved auctions of every chunk as dicts.
+    `shard` is a (workers, index) pair that restricts this run to the ids congruent to index modulo workers, so
+    parallel workers never pick the same auction.
+    """
+    now = now or timezone.now()
+    while True:
+        chunk = list(expired_auctions(now, shard).values('id', 'title', 'seller', 'highest_bidder')[:chunk_size])
+        if not chunk:
+            return
+        yield resolve_chunk(chunk)
+
+
+def resolve_chunk(chunk):
+    """Resolve the auctions of `chunk`, returns the ones resolved here, which leaves out those that changed since."""
+    ids = [auction['id'] for auction in chunk]
+
+    with transaction.atomic():
+        # the status guard skips auctions that changed since they were selected, and the write holds the ones it
+        # bumped until the commit, so what is still active right after is exactly what this call resolves
+        AuctionModel.objects.filter(id__in=ids, status=AuctionModel.ACTIVE).update(version=F('version') + 1)
+        ids = set(AuctionModel.objects.filter(id__in=ids, status=AuctionModel.ACTIVE).values_list('id', flat=True))
+        chunk = [auction for auction in chunk if auction['id'] in ids]
+        if not chunk:
+            return chunk
+
+        AuctionModel.objects.filter(id__in=ids).update(status=Case(
+            When(highest_bidder=None, then=Value(AuctionModel.DUE)), default=Value(AuctionModel.ADJUDECATED)))
+        auctions_changed()
+        if listening():
+            publish(*AuctionModel.objects.filter(id__in=ids).only('id', 'highest_bid', 'version', 'status'))
+
+        bidders = defaultdict(list)
+        for auction_id, bidder_id in Bid.objects.filter(auction_id__in=ids).values_list('auction_id', 'bidder_id')\
+                .distinct():
+            bidders[auction_id].append(bidder_id)
+
+        queue_notifications([(bidders[auction['id']] + [auction['seller']], 'Auction resolved',
+                              'Auction #' + str(auction['id']) + ' has been banned') for auction in chunk])
+
+    return chunk
@@ -0,0 +1,75 @@
+import heapq
+
+from django.db.models import Max
+from django.utils import timezone
+
+from auction.models import AuctionModel
+from auction.resolver import resolve_chunk
+
+
+class DeadlineScheduler:
+    """
+    Keeps the deadlines of active auctions in a min-heap and resolves each auction once its deadline passes.
+
+    Only deadlines within `horizon` of now are held in memory. The window is extended with index range scans on
+    (status, deadline_date), and auctions created after startup are picked up by polling past the highest id seen,
+    so no tick ever scans the whole active set.
+    """
+
+    def __init__(self, horizon=timezone.timedelta(hours=1), batch_size=1000):
+        self.horizon = horizon
+        self.batch_size = batch_size
+        self.heap = []
+        self.loaded_until = None
+        self.last_id = AuctionModel.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+    def push(self, auction_id, deadline_date):
+        heapq.heappush(self.heap, (deadline_date, auction_id))
+
+    def load(self, now):
+        active = AuctionModel.objects.filter(status=AuctionModel.ACTIVE)
+
+        until = now + self.horizon
+        window = active.filter(deadline_date__lt=until)
+        if self.loaded_until is not None:
+            window = window.filter(deadline_date__gte=self.loaded_until)
+        for auction_id, deadline_date in window.values_list('id', 'deadline_date').iterator(chunk_size=self.batch_size):
+            self.push(auction_id, deadline_date)
+        self.loaded_until = until
+
+        # auctions created since the last tick whose deadline falls inside the window that is already loaded
+        created = active.filter(id__gt=self.last_id).order_by('id').values_list('id', 'deadline_date')
+        for auction_id, deadline_date in created.iterator(chunk_size=self.batch_size):
+            if deadline_date < self.loaded_until:
+                self.push(auction_id, deadline_date)
+            self.last_id = auction_id
+
+    def tick(self, now=None):
+        """
+        Resolve every auction that is due at `now`, returns the resolved auctions. When resolving fails the auctions
+        left are kept and the error is raised.
+        """
+        now = now or timezone.now()
+        self.load(now)
+
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            due.append(heapq.heappop(self.heap))
+
+        resolved = []
+        for i in range(0, len(due), self.batch_size):
+            ids = [auction_id for _, auction_id in due[i:i + self.batch_size]]
+            try:
+                chunk = list(AuctionModel.objects.filter(id__in=ids, status=AuctionModel.ACTIVE)
+                             .values('id', 'title', 'seller', 'highest_bidder'))
+                if chunk:
+                    resolved.extend(resolve_chunk(chunk))
+            except Exception:
+                # the chunk rolled back, it and the ones after it are due again on the next tick
+                for entry in due[i:]:
+                    heapq.heappush(self.heap, entry)
+                raise
+        return resolved
+
+    def next_deadline(self):
+        return self.heap[0][0] if self.heap else None
@@ -0,0 +1,180 @@
+import math
+import re
+import threading
+from collections import defaultdict, Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from auction.models import AuctionModel
+from auction.pagination import paginate, paginate_ranked
+
+FTS_TABLE = 'auction_search'
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def tokenize(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+class Fts5Index:
+    """SQLite FTS5 table over auction titles and descriptions, ranked with bm25."""
+
+    def add(self, auction):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [auction.id])
+            cursor.execute('INSERT INTO %s (rowid, title, description) VALUES (%%s, %%s, %%s)' % FTS_TABLE,
+                           [auction.id, auction.title, auction.description])
+
+    def remove(self, auction_id):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s WHERE rowid = %%s' % FTS_TABLE, [auction_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM %s' % FTS_TABLE)
+            cursor.execute('INSERT INTO %s (rowid, title, description) SELECT id, title, description FROM %s' % (
+                FTS_TABLE, AuctionModel._meta.db_table))
+
+    def search(self, terms, statuses=None, limit=None):
+        # every term is a prefix query, so "ite" still finds "item1" like the old substring search did
+        query = ' '.join('"%s"*' % term for term in terms)
+        sql = 'SELECT s.rowid FROM %s s JOIN %s a ON a.id = s.rowid WHERE %s MATCH %%s' % (
+            FTS_TABLE, AuctionModel._meta.db_table, FTS_TABLE)
+        params = [query]
+        if statuses is not None:
+            sql += ' AND a.status IN (%s)' % ', '.join(['%s'] * len(statuses))
+            params.extend(statuses)
+        sql += ' ORDER BY s.rank, s.rowid'
+        if limit is not None:
+            sql += ' LIMIT %s'
+            params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndex:
+    """
+    In-process fallback for databases without FTS5. Built from the database on first use and kept up to date by the
+    save signals of this process only.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self.lock = threading.Lock()
+        self.rebuild()
+
+    def add(self, auction):
+        with self.lock:
+            self._remove(auction.id)
+            counts = Counter(tokenize(auction.title) * 2 + tokenize(auction.description))
+            for token, count in counts.items():
+                self.postings[token][auction.id] = count
+            self.documents[auction.id] = list(counts)
+
+    def remove(self, auction_id):
+        with self.lock:
+            self._remove(auction_id)
+
+    def _remove(self, auction_id):
+        for token in self.documents.pop(auction_id, []):
+            self.postings[token].pop(auction_id, None)
+            if not self.postings[token]:
+                del self.postings[token]
+
+    def rebuild(self):
+        with self.lock:
+            self.postings.clear()
+            self.documents.clear()
+        for auction in AuctionModel.objects.only('id', 'title', 'description').iterator(chunk_size=2000):
+            self.add(auction)
+
+    def search(self, terms, statuses=None, limit=None):
+        with self.lock:
+            scores = None
+            for term in terms:
+                matches = {}
+                for token in [token for token in self.postings if token.startswith(term)]:
+                    idf = math.log(1 + len(self.documents) / len(self.postings[token]))
+                    for auction_id, count in self.postings[token].items():
+                        matches[auction_id] = matches.get(auction_id, 0) + count * idf
+                scores = matches if scores is None else {
+                    auction_id: score + matches[auction_id] for auction_id, score in scores.items()
+                    if auction_id in matches}
+
+        ranked = sorted(scores or {}, key=lambda auction_id: (-scores[auction_id], auction_id))
+        if statuses is None:
+            return ranked[:limit]
+
+        results = []
+        for i in range(0, len(ranked), 500):
+            chunk = ranked[i:i + 500]
+            allowed = set(AuctionModel.objects.filter(id__in=chunk, status__in=statuses).values_list('id', flat=True))
+            results.extend(auction_id for auction_id in chunk if auction_id in allowed)
+            if limit is not None and len(results) >= limit:
+                break
+        return results[:limit]
+
+
+def fts5_table_exists():
+    if connection.vendor != 'sqlite':
+        return False
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = Fts5Index() if fts5_table_exists() else InvertedIndex()
+    return _index
+
+
+def search_ids(term, statuses=None, limit=None):
+    """Ids of the auctions matching every term of `term`, best match first."""
+    terms = tokenize(term)
+    if not terms:
+        return []
+    return get_index().search(terms, statuses, limit or settings.SEARCH_MAX_RESULTS)
+
+
+def search_auctions(term, auctions, statuses=None):
+    """The auctions of the `auctions` queryset matching `term`, ordered by relevance."""
+    return _load_ranked(search_ids(term, statuses), auctions)
+
+
+def search_page(term, auctions, statuses=None, cursor=None, size=None):
+    """One page of search results, only the auctions on that page are loaded."""
+    page = paginate_ranked(search_ids(term, statuses), cursor, size)
+    page.items = _load_ranked(page.items, auctions)
+    return page
+
+
+def find_page(term, auctions, statuses=None, cursor=None, size=None):
+    """A page of the auctions matching `term` by relevance, or of all `auctions` by deadline when there is no term."""
+    if term:
+        return search_page(term, auctions, statuses, cursor, size)
+    return paginate(auctions, cursor, size)
+
+
+def _load_ranked(ids, auctions):
+    position = {auction_id: i for i, auction_id in enumerate(ids)}
+    return sorted(auctions.filter(id__in=ids), key=lambda auction: position[auction.id])
+
+
+@receiver(post_save, sender=AuctionModel)
+def index_auction(sender, instance, **kwargs):
+    get_index().add(instance)
+
+
+@receiver(post_delete, sender=AuctionModel)
+def unindex_auction(sender, instance, **kwargs):
+    get_index().remove(instance.id)
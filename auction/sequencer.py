@@ -0,0 +1,219 @@
+import copy
+import logging
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from auction.bidding import check_bid, place_bid, settle_proxies, BidResult
+from auction.live import publish
+from auction.models import AuctionModel, Bid
+from auction.money import Money
+
+logger = logging.getLogger(__name__)
+
+_sequencer = None
+_sequencer_pid = None
+_sequencer_lock = threading.Lock()
+
+
+class BidSequencer:
+    """
+    Every auction belongs to one of `threads` writer threads, so the bids of an auction are settled one after another
+    without waiting on each other's locks. A writer validates the bids against the auction it keeps in memory and
+    writes the accepted ones of everything queued in the meantime, up to `batch_size` bids, in one transaction. The
+    update is guarded by the version it last saw, a write from elsewhere makes it reload the auction and settle again
+    in the next transaction.
+    A bid is answered once its transaction committed.
+
+    `connections_override` hands connections of the calling thread to the writers, like Django's live server thread
+    does, so they can work inside the transaction of a test.
+    """
+
+    def __init__(self, threads, batch_size, cache_size, connections_override=None):
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.connections_override = connections_override
+        self.queues = [queue.Queue() for i in range(threads)]
+        # auctions as last written, each dict is only touched by the thread of its queue
+        self.auctions = [OrderedDict() for i in range(threads)]
+        self.threads = [threading.Thread(target=self.run, args=(i,), name='bid-sequencer-%d' % i, daemon=True)
+                        for i in range(threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, auction_id, user, amount, version=None, timeout=None):
+        """Queue a bid and wait for it to be settled, returns its BidResult like place_bid."""
+        future = Future()
+        auction_id = int(auction_id)
+        self.queues[auction_id % len(self.queues)].put((auction_id, user, Money.parse(amount), version, future))
+        return future.result(timeout)
+
+    def stop(self):
+        for bids in self.queues:
+            bids.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def run(self, partition):
+        if self.connections_override:
+            for alias, conn in self.connections_override.items():
+                connections[alias] = conn
+
+        bids = self.queues[partition]
+        stopping = False
+        try:
+            while not stopping:
+                batch = []
+                bid = bids.get()
+                while bid is not None:
+                    batch.append(bid)
+                    if len(batch) == self.batch_size:
+                        break
+                    try:
+                        bid = bids.get_nowait()
+                    except queue.Empty:
+                        break
+                stopping = bid is None
+                if batch:
+                    self.flush(partition, batch)
+        finally:
+            self.close()
+
+    def close(self):
+        if not self.connections_override:
+            connection.close()
+
+    def flush(self, partition, batch):
+        for future, result in self.write(partition, batch):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def write(self, partition, batch):
+        """
+        Write `batch` in as many transactions as writes from elsewhere take, returns (future, BidResult or exception)
+        pairs. A transaction that fails only fails the bids still pending, the ones committed before stand.
+        """
+        pending = OrderedDict()
+        for bid in batch:
+            pending.setdefault(bid[0], []).append(bid)
+
+        results = []
+        while pending:
+            written = []
+            try:
+                # the auctions are read before the transaction, which then starts with a write: SQLite cannot upgrade
+                # a transaction that read to the write lock while another writer holds it
+                auctions = self.load(partition, pending, written)
+                stale, accepted = OrderedDict(), []
+                with transaction.atomic():
+                    for auction_id, auction in auctions.items():
+                        created = self.settle(partition, auction, pending[auction_id], written)
+                        if created is None:
+                            stale[auction_id] = pending[auction_id]
+                        else:
+                            accepted.extend(created)
+                    Bid.objects.bulk_create(accepted)
+            except Exception as e:
+                bids = [bid for bids in pending.values() for bid in bids]
+                logger.exception("Writing %d bids failed", len(bids))
+                # the transaction rolled back, what is in memory may not be what is in the database
+                self.auctions[partition].clear()
+                self.close()
+                results.extend((bid[4], e) for bid in bids)
+                break
+            results.extend(written)
+            # the ones written elsewhere in the meantime are read again and settled in a transaction of their own
+            pending = stale
+        return results
+
+    def load(self, partition, pending, results):
+        """The auctions `pending` bids go to, from memory or read in one query. Bids on missing auctions fail."""
+        cached = self.auctions[partition]
+        auctions, missing = OrderedDict(), []
+        for auction_id, bids in pending.items():
+            auction = cached.get(auction_id)
+            # a client that saw a newer version than the one in memory means the auction was written elsewhere
+            if auction and not any(bid[3] is not None and bid[3] > auction.version for bid in bids):
+                auctions[auction_id] = auction
+            else:
+                auctions[auction_id] = None
+                missing.append(auction_id)
+
+        if missing:
+            found = AuctionModel.objects.in_bulk(missing)
+            for auction_id in missing:
+                if auction_id in found:
+                    auctions[auction_id] = found[auction_id]
+                else:
+                    del auctions[auction_id]
+                    error = AuctionModel.DoesNotExist("AuctionModel matching query does not exist.")
+                    results.extend((bid[4], error) for bid in pending[auction_id])
+        return auctions
+
+    def settle(self, partition, auction, bids, results):
+        """
+        Validate `bids` in their order against `auction` and write the outcome, returns the Bid rows to create. None
+        when the auction was written elsewhere since it was read, nothing is written or answered then.
+        """
+        cached = self.auctions[partition]
+        current = copy.copy(auction)
+        outcome, accepted = [], []
+        for _, user, amount, version, future in bids:
+            status = check_bid(current, user, amount, version)
+            if status:
+                outcome.append((future, BidResult(status, copy.copy(current), amount)))
+                continue
+
+            created = Bid(auction_id=auction.id, bidder_id=user.id, amount=amount, created_at=timezone.now())
+            current.highest_bid, current.highest_bidder = amount, user
+            current.bid_count += 1
+            current.version += 1
+            accepted.append(created)
+            outcome.append((future, BidResult(BidResult.ACCEPTED, copy.copy(current), amount, created)))
+
+        if accepted and not AuctionModel.objects.filter(id=auction.id, version=auction.version,
+                                                        status=AuctionModel.ACTIVE).update(
+                highest_bid=current.highest_bid,
+                highest_bidder=current.highest_bidder,
+                bid_count=F('bid_count') + len(accepted),
+                version=F('version') + len(accepted)):
+            cached.pop(auction.id, None)
+            return None
+
+        if accepted:
+            # the maximum bids answer the last accepted bid, their rows are written by settle_proxies itself
+            settle_proxies(current)
+            publish(current)
+        cached.pop(auction.id, None)
+        cached[auction.id] = current
+        while len(cached) > self.cache_size:
+            cached.popitem(last=False)
+        results.extend(outcome)
+        return accepted
+
+
+def get_sequencer():
+    """The sequencer of this process, started on first use and again in a forked worker."""
+    global _sequencer, _sequencer_pid
+    with _sequencer_lock:
+        if _sequencer is None or _sequencer_pid != os.getpid():
+            _sequencer = BidSequencer(settings.BID_SEQUENCER_THREADS, settings.BID_SEQUENCER_BATCH_SIZE,
+                                      settings.BID_SEQUENCER_CACHE_SIZE)
+            _sequencer_pid = os.getpid()
+        return _sequencer
+
+
+def submit_bid(auction_id, user, amount, version=None):
+    """place_bid, or through the sequencer of this process when BID_SEQUENCER is set."""
+    if not settings.BID_SEQUENCER:
+        return place_bid(auction_id, user, amount, version)
+    return get_sequencer().submit(auction_id, user, amount, version, settings.BID_SEQUENCER_TIMEOUT)
@@ -1,112 +1,256 @@
 import json
 import re
-from datetime import datetime
-from random import choice, randint
+from decimal import InvalidOperation
+from random import randint
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.mail import send_mail
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
-from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.timezone import is_naive, make_aware
 from django.views import View
 from rest_framework.authentication import BasicAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.decorators import authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
-from auction.models import AuctionModel
-from auction.utils import AuctionSerializer
+from auction.authentication import CachedTokenAuthentication
+from auction.bidding import BidResult, place_max_bid
+from auction.currency import currency_rates, get_currency, with_prices
+from auction.etags import changes, conditional, make_etag, not_modified
+from auction.generator import generate, DEFAULT_PASSWORD
+from auction.models import AuctionModel, Bid
+from auction.money import Money
+from auction.pagination import paginate, page_size
+from auction.search import find_page
+from auction.sequencer import submit_bid
+from auction.tasks import queue_mail, queue_seller_notification
+from auction.utils import AuctionSerializer, BidSerializer
+
+
+def paginated_response(request, page, data):
+    # the cursors travel in a Link header so the body stays a plain list
+    links = []
+    for rel, cursor in (('next', page.next), ('prev', page.prev)):
+        if cursor:
+            query = request.GET.copy()
+            query['cursor'] = cursor
+            links.append('<%s>; rel="%s"' % (request.build_absolute_uri(request.path + '?' + query.urlencode()), rel))
+
+    response = Response(data, status=200)
+    if links:
+        response['Link'] = ', '.join(links)
+    return response
+
+
+def stream_auctions(auctions, ndjson=False):
+    """Serialize auctions one by one as a JSON array or as newline delimited JSON."""
+    rows = (json.dumps(AuctionSerializer(auction).data, cls=JSONEncoder)
+            for auction in auctions.iterator(chunk_size=settings.STREAM_CHUNK_SIZE))
+    if ndjson:
+        for row in rows:
+            yield row + '\n'
+        return
+
+    yield '['
+    for i, row in enumerate(rows):
+        yield row if i == 0 else ',' + row
+    yield ']'
 
 
 class BrowseAuctionApi(APIView):
     def get(self, request):
-        auctions = AuctionModel.objects.filter(status=AuctionModel.ACTIVE)
-        serializer = AuctionSerializer(auctions, many=True)
-        return Response(serializer.data, status=200)
+        currency = get_currency(request)
+        # read before the auctions, a change that lands in between only costs the client one more full response
+        etag = make_etag('browse', changes(), currency, currency_rates().get(currency), request.GET.urlencode())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        auctions, _ = with_prices(AuctionModel.objects.filter(status=AuctionModel.ACTIVE).select_related('seller'),
+                                  currency)
+
+        # ?stream=json or ?stream=ndjson returns every active auction without building the list in memory
+        stream = request.GET.get('stream')
+        if stream in ('json', 'ndjson'):
+            return conditional(StreamingHttpResponse(
+                stream_auctions(auctions.order_by('deadline_date', 'id'), ndjson=stream == 'ndjson'),
+                content_type='application/x-ndjson' if stream == 'ndjson' else 'application/json', status=200), etag)
+
+        page = paginate(auctions, request.GET.get('cursor'), page_size(request))
+        serializer = AuctionSerializer(page, many=True)
+        return conditional(paginated_response(request, page, serializer.data), etag)
 
 
 class SearchAuctionApi(APIView):
     def get(self, request, term):
-        if term.lower() != '':
-            criteria = term.lower().strip()
-            auctions = AuctionModel.objects.filter(title__contains=criteria, status=AuctionModel.ACTIVE)
-        else:
-            auctions = AuctionModel.objects.filter(status=AuctionModel.ACTIVE)
+        criteria = term.lower().strip()
+        auctions, _ = with_prices(AuctionModel.objects.filter(status=AuctionModel.ACTIVE).select_related('seller'),
+                                  get_currency(request))
+        page = find_page(criteria, auctions, [AuctionModel.ACTIVE], request.GET.get('cursor'), page_size(request))
 
-        return Response(AuctionSerializer(auctions, many=True).data, status=200)
+        return paginated_response(request, page, AuctionSerializer(page, many=True).data)
 
 
 class SearchAuctionWithTermApi(APIView):
     def get(self, request):
-        if request.GET['term'].lower() != '':
-            criteria = request.GET['term'].lower().strip()
-            auctions = AuctionModel.objects.filter(title__contains=criteria, status=AuctionModel.ACTIVE)
-        else:
-            auctions = AuctionModel.objects.filter(status=AuctionModel.ACTIVE)
-        return Response(AuctionSerializer(auctions, many=True).data, status=200)
+        criteria = request.GET['term'].lower().strip()
+        auctions, _ = with_prices(AuctionModel.objects.filter(status=AuctionModel.ACTIVE).select_related('seller'),
+                                  get_currency(request))
+        page = find_page(criteria, auctions, [AuctionModel.ACTIVE], request.GET.get('cursor'), page_size(request))
+        return paginated_response(request, page, AuctionSerializer(page, many=True).data)
 
 
 class SearchAuctionApiById(APIView):
     def get(self, request, auction_id):
+        currency = get_currency(request)
+        # every edit and bid bumps the version, the index lookup alone decides an unchanged auction
+        version = AuctionModel.objects.filter(id=auction_id).values_list('version', flat=True).first()
+        etag = make_etag('auction', auction_id, version, currency, currency_rates().get(currency))
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
         try:
-            auction = AuctionModel.objects.get(id=int(auction_id))
+            auctions, _ = with_prices(AuctionModel.objects.select_related('seller'), currency)
+            auction = auctions.get(id=int(auction_id))
         except AuctionModel.DoesNotExist:
             auction = None
 
-        return Response(AuctionSerializer(auction).data, status=200)
+        return conditional(Response(AuctionSerializer(auction).data, status=200), etag)
+
+
+class BidHistoryApi(APIView):
+    """
+    The bids of an auction, oldest first and paginated like the other lists. `since` (ISO 8601) leaves out the bids
+    up to that time, so a client following the auction asks for what came after the last bid it has.
+    """
+
+    def get(self, request, auction_id):
+        version = AuctionModel.objects.filter(id=auction_id).values_list('version', flat=True).first()
+        if version is None:
+            return Response({"message": "Auction not found"}, status=404)
+
+        # every bid bumps the version, with the query it names the page, an unchanged one is answered without the bids
+        etag = make_etag('bids', auction_id, version, request.GET.urlencode())
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+        bids = Bid.objects.filter(auction_id=auction_id).select_related('bidder')
+        if request.GET.get('since'):
+            try:
+                # an unencoded + of the offset arrives as a space
+                since = parse_datetime(re.sub(r' (\d\d:?\d\d)$', r'+\1', request.GET['since']))
+            except ValueError:
+                # well formed, but not a date, like month 13
+                since = None
+            if since is None:
+                return Response({"message": "since must be an ISO 8601 date and time"}, status=400)
+            bids = bids.filter(created_at__gt=make_aware(since) if is_naive(since) else since)
+
+        page = paginate(bids, request.GET.get('cursor'), page_size(request), keys=('created_at', 'amount', 'id'))
+        return conditional(paginated_response(request, page, BidSerializer(page, many=True).data), etag)
+
+
+@authentication_classes([])
+class ObtainTokenApi(ObtainAuthToken):
+    """The API token of the user, created on the first request. Takes the username and password."""
+
+
+@authentication_classes([CachedTokenAuthentication, BasicAuthentication])
+@permission_classes([IsAuthenticated])
+class RotateTokenApi(APIView):
+    def post(self, request):
+        # deleting the old token revokes it in every process
+        with transaction.atomic():
+            Token.objects.filter(user=request.user).delete()
+            token = Token.objects.create(user=request.user)
+
+        return Response({'token': token.key}, status=200)
 
 
-@authentication_classes([BasicAuthentication])
+# Basic authentication hashes the password on every request, clients that bid often should use a token
+@authentication_classes([CachedTokenAuthentication, BasicAuthentication])
 @permission_classes([IsAuthenticated])
 class BidAuctionApi(APIView):
     def post(self, request, auction_id):
-        user = User.objects.get(username=request.user)
-        auction = AuctionModel.objects.get(id=auction_id)
+        try:
+            amount = Money.parse(request.data['new_price'])
+        except ValueError:
+            return Response({"message": "Bid must be a number"}, status=400)
+
+        result = submit_bid(auction_id, request.user, amount)
+        auction = result.auction
+
+        # a registered maximum of another bidder may have answered the bid before it returned
+        leading = auction.highest_bidder_id == request.user.id
 
-        if auction.status != AuctionModel.ACTIVE:
+        if result.accepted:
+            with transaction.atomic():
+                queue_seller_notification(auction, result.bid, 'Auction has been bid through API')
+
+                if leading:
+                    queue_mail(
+                        'You have bid an auction',
+                        'You have the highest bid to auction #' + str(auction.id),
+                        [request.user.email]
+                    )
+
+        if result.status == BidResult.INACTIVE:
             return Response({"message": "Can only bid on active auction"}, status=400)
 
-        if auction.seller is request.user.id:
+        if result.status == BidResult.OWN_AUCTION:
             return Response({"message": "Cannot bid on own auction"}, status=400)
 
+        if result.status == BidResult.OUTBID:
+            return Response({"message": "New bid must be greater than the current bid at least 0.01"}, status=400)
+
+        response = {
+            'message': 'Bid successfully' if leading else 'Bid placed, but outbid by a maximum bid',
+            'title': auction.title,
+            'description': auction.description,
+            'current_price': float(auction.highest_bid),
+            'leading': leading,
+            'deadline_date': auction.deadline_date
+        }
+
+        return Response(response, status=200)
+
+
+@authentication_classes([CachedTokenAuthentication, BasicAuthentication])
+@permission_classes([IsAuthenticated])
+class ProxyBidAuctionApi(APIView):
+    def post(self, request, auction_id):
         try:
-            new_price = float(request.data['new_price'])
-            amount = float("{0:.2f}".format(new_price))
-        except ValueError:
-            return Response({"message": "Bid must be a number"}, status=400)
+            maximum = Money.parse(request.data['max_price'])
+        except (KeyError, ValueError, InvalidOperation):
+            return Response({"message": "Maximum bid must be a number"}, status=400)
 
-        if int(amount * 100) < int(auction.highest_bid * 100) + 1:
-            return Response({"message": "New bid must be greater than the current bid at least 0.01"}, status=400)
+        result = place_max_bid(auction_id, request.user, maximum)
+        auction = result.auction
 
-        auction.highest_bid = amount
-        auction.highest_bidder = user.id
-        auction.save()
-
-        bidders = json.loads(auction.bidders)
-        bidders.append(user.id)
-        auction.bidders = json.dumps(bidders)
-
-        send_mail(
-            'Auction has been bid through API',
-            'Auction #' + str(auction.id) + ' has a new highest bid',
-            'yaas-no-reply@yaas.com',
-            [User.objects.get(id=auction.seller).email],
-            fail_silently=False,
-        )
-
-        send_mail(
-            'You have bid an auction',
-            'You have the highest bid to auction #' + str(auction.id),
-            'yaas-no-reply@yaas.com',
-            [User.objects.get(id=user.id).email],
-            fail_silently=False,
-        )
+        if result.status == BidResult.INACTIVE:
+            return Response({"message": "Can only bid on active auction"}, status=400)
+
+        if result.status == BidResult.OWN_AUCTION:
+            return Response({"message": "Cannot bid on own auction"}, status=400)
+
+        if result.status == BidResult.OUTBID:
+            return Response({"message": "Maximum bid must be greater than the current bid at least 0.01"}, status=400)
 
         response = {
-            'message': 'Bid successfully',
+            'message': 'Maximum bid registered',
             'title': auction.title,
-            'description': auction.description,
-            'current_price': auction.highest_bid,
+            'maximum': float(maximum),
+            'current_price': float(auction.highest_bid),
+            'leading': auction.highest_bidder_id == request.user.id,
             'deadline_date': auction.deadline_date
         }
 
@@ -115,54 +259,11 @@ class BidAuctionApi(APIView):
 
 class GenerateDataAPI(View):
     def get(self, request):
-        products_str = "Bacon pork belly bacon short ribs tenderloin strip steak landjaeger biltong meatball flank, " \
-                       "kielbasa shank.  Spare ribs venison sirloin short loin pork loin tri-tip, pork chop pork " \
-                       "belly tongue.  Beef doner pork chop alcatra cupim.  Pastrami short ribs boudin, corned beef " \
-                       "leberkas ribeye buffalo filet mignon prosciutto rump tongue sausage beef ribs bresaola cow. "
-        products = re.split('\W+', products_str)
-
-        timestamp = '_' + str(datetime.now().timestamp())[3:10]
-        deadline_date = timezone.now() + timezone.timedelta(hours=73)
-
-        usernames_prefix = ['edwin_elric', 'lelouch', 'kira', 'natsu', 'luffy', 'kakashi', 'goku']
-        usernames_suffix = ['', '11', '42', '7', '1000', '4k', '420']
-        usernames = ['vanntile' + timestamp]
-
-        users = []
-        auctions = []
-
-        for prefix in usernames_prefix:
-            for suffix in usernames_suffix:
-                usernames.append(prefix + suffix + timestamp)
-
-        # create users
-        for username in usernames:
-            user = User.objects.create_user(username, username + '@yaas.com', username)
-            user.save()
-            users.append(user)
-
-            # create auctions
-            for i in range(1, randint(1, 5)):
-                description = ''.join(choice(products_str) for j in range(randint(50, 300)))
-                price = randint(1, 100)
-                auction = AuctionModel(seller=user.id, title=choice(products), description=description,
-                                       minimum_price=price, deadline_date=deadline_date, highest_bid=price)
-                auction.save()
-                auctions.append(auction)
-
-        # create bids
-        for i in range(randint(15, 40)):
-            user = User.objects.get(id=randint(users[0].id, users[-1].id))
-            auction = AuctionModel.objects.get(id=randint(auctions[0].id, auctions[-1].id))
-
-            auction.highest_bid = auction.highest_bid + randint(10, 100)
-            auction.highest_bidder = user.id
-            bidders = json.loads(auction.bidders)
-            bidders.append(user.id)
-            auction.bidders = json.dumps(bidders)
-            auction.save()
+        # a small sample, use the generate_data command for real volumes
+        user_ids, auction_ids = generate(users=50, auctions=randint(50, 200), bids=randint(15, 40))
 
         return render(request, 'generateData.html', {
-            'users': users,
-            'auctions': auctions
+            'users': User.objects.filter(id__in=user_ids).order_by('id'),
+            'auctions': AuctionModel.objects.filter(id__in=auction_ids).select_related('seller').order_by('id'),
+            'password': DEFAULT_PASSWORD
         }, status=200)
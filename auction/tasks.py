@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.utils.dateparse import parse_datetime
+
+from auction.digest import schedule_digest, send_digest
+from auction.notifications import notify_many as _notify_many, notify_users as _notify_users
+from auction.rates import refresh_rates as _refresh_rates
+from metrics.registry import timed
+from tasks.queue import task, enqueue
+
+
+@task('auction.send_mail')
+def send_mail(subject, message, recipient_list, html=False):
+    msg = EmailMessage(subject, message, 'yaas-no-reply@yaas.com', recipient_list)
+    if html:
+        msg.content_subtype = "html"
+    with timed('mail', 'send_mail'):
+        msg.send()
+
+
+def queue_mail(subject, message, recipient_list, html=False):
+    enqueue('auction.send_mail', subject=subject, message=message, recipient_list=recipient_list, html=html)
+
+
+@task('auction.notify_users')
+def notify_users(user_ids, subject, message):
+    _notify_users(user_ids, subject, message)
+
+
+def queue_notification(user_ids, subject, message):
+    enqueue('auction.notify_users', user_ids=list(user_ids), subject=subject, message=message)
+
+
+@task('auction.notify_many')
+def notify_many(notifications):
+    _notify_many(notifications)
+
+
+def queue_notifications(notifications):
+    """One task for a list of (user_ids, subject, message), instead of one per message."""
+    enqueue('auction.notify_many', notifications=[(list(user_ids), subject, message)
+                                                  for user_ids, subject, message in notifications])
+
+
+def queue_seller_notification(auction, bid, subject):
+    """Tell the seller about the new highest bid, in the next digest when SELLER_DIGEST_WINDOW is set."""
+    if auction.seller_id is None:
+        return
+    if settings.SELLER_DIGEST_WINDOW:
+        schedule_digest(auction.seller_id, bid.created_at)
+    else:
+        queue_notification([auction.seller_id], subject, 'Auction #' + str(auction.id) + ' has a new highest bid')
+
+
+@task('auction.seller_digest')
+def seller_digest(seller_id, since, until):
+    send_digest(seller_id, parse_datetime(since), parse_datetime(until))
+
+
+@task('auction.refresh_rates')
+def refresh_rates():
+    _refresh_rates()
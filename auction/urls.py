@@ -7,11 +7,12 @@ urlpatterns = [
     path('', views.Index.as_view(), name='index'),
     path('search/', views.search, name='search'),
     path('create/', views.CreateAuction.as_view(), name='create'),
-    re_path(r'(create|edit|bid|ban)/success/', views.success, name='success'),
+    re_path(r'(create|edit|bid|outbid|proxy|ban)/success/', views.success, name='success'),
     path('create/error', views.edit_auction_error, name='forbidden'),
     re_path(r'^edit/(\d+)/$', views.EditAuction.as_view(), name='edit'),
     re_path(r'^edit/(\S+)/$', views.EditSigned.as_view(), name='edit_signed'),
     re_path(r'^bid/(\d+)/$', views.bid, name='bid'),
+    re_path(r'^proxy/(\d+)/$', views.proxy, name='proxy'),
     re_path(r'^ban/(\d+)$', views.ban, name='ban'),
     path('resolve/', views.resolve, name='resolve')
 ]
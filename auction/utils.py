@@ -4,14 +4,15 @@ from django.http import HttpResponse
 from django.utils import timezone
 from rest_framework import serializers
 
-from auction.models import AuctionModel
-from yaas.settings import CURRENCY_COOKIE_NAME
+from auction.currency import converted
+from auction.models import AuctionModel, Bid
+from auction.money import MoneyFormField
 
 
 class CreateAuctionForm(forms.Form):
     title = forms.CharField(max_length=256)
     description = forms.CharField(max_length=3000, widget=forms.Textarea(attrs={'cols': 50}), required=False)
-    minimum_price = forms.FloatField(initial=0.01)
+    minimum_price = MoneyFormField(initial='0.01')
     deadline_date = forms.CharField(initial=(timezone.now() + timezone.timedelta(hours=73)).strftime('%d.%m.%Y %H:%M:%S'))
 
 
@@ -26,27 +27,31 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('email', 'username')
 
 
+class PriceField(serializers.FloatField):
+    """A price in the currency the auctions were loaded with, see auction.currency.with_prices"""
+
+    def get_attribute(self, instance):
+        return float(converted(instance, self.source))
+
+
 class AuctionSerializer(serializers.ModelSerializer):
+    minimum_price = PriceField()
+    seller = serializers.CharField(source='seller.username', default=None)
+
     class Meta:
         model = AuctionModel
-        fields = ('title', 'description', 'minimum_price', 'deadline_date')
+        fields = ('title', 'description', 'minimum_price', 'deadline_date', 'seller')
 
 
-def generate_response(message):
-    return HttpResponse('<p>' + message + "</p> <p>You can check out the <a href='/'>homepage</a>.</p>", content_type="text/html", status=200)
+class BidSerializer(serializers.ModelSerializer):
+    bidder = serializers.CharField(source='bidder.username', default=None)
+    amount = serializers.FloatField()
 
+    class Meta:
+        model = Bid
+        fields = ('bidder', 'amount', 'created_at')
 
-def set_currencies(request, auctions):
-    if CURRENCY_COOKIE_NAME in request.COOKIES and float(request.COOKIES[CURRENCY_COOKIE_NAME]) != 0:
-        rate = float(request.COOKIES[CURRENCY_COOKIE_NAME])
-        currency = 'usd'
-    else:
-        rate = 0
-        currency = 'eur'
 
-    if rate:
-        for auction in auctions:
-            auction.highest_bid = auction.highest_bid / rate
-            auction.minimum_price = auction.minimum_price / rate
+def generate_response(message):
+    return HttpResponse('<p>' + message + "</p> <p>You can check out the <a href='/'>homepage</a>.</p>", content_type="text/html", status=200)
 
-    return currency
@@ -1,11 +1,12 @@
 import json
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timedelta
+from decimal import InvalidOperation
 
-import requests
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth.models import User
 from django.core import signing
-from django.core.mail import send_mail, EmailMessage
+from django.db import transaction
+from django.db.models import F
 from django.http import HttpResponseRedirect, HttpResponse
 from django.shortcuts import render
 from django.urls import reverse
@@ -15,34 +16,46 @@ from django.utils.timezone import make_aware
 from django.views import View
 from django.views.decorators.http import require_POST, require_GET
 
+from auction.bidding import BidResult, place_max_bid
+from auction.cards import render_cards
+from auction.currency import currency_rates, get_currency, with_prices
+from auction.live import listening, publish
 from auction.models import AuctionModel
-from auction.utils import CreateAuctionForm, EditAuctionForm, set_currencies, generate_response
-from yaas.settings import LANGUAGE_COOKIE_NAME, CURRENCY_API, CURRENCY_COOKIE_NAME
+from auction.money import Money
+from auction.resolver import resolve_expired
+from auction.pagination import paginate, page_size
+from auction.search import find_page
+from auction.sequencer import submit_bid
+from auction.tasks import queue_mail, queue_notification, queue_seller_notification
+from auction.utils import CreateAuctionForm, EditAuctionForm, generate_response
+from user.models import Language
+from yaas.settings import LANGUAGE_COOKIE_NAME, CURRENCY_COOKIE_NAME
 
 
 class Index(View):
     def get(self, request):
-        auctions = AuctionModel.objects.filter(status=AuctionModel.ACTIVE)
-        currency = set_currencies(request, auctions)
+        auctions, currency = with_prices(AuctionModel.objects.filter(status=AuctionModel.ACTIVE)
+                                         .select_related('seller'), get_currency(request))
+        page = paginate(auctions, request.GET.get('cursor'), page_size(request))
 
-        return render(request, 'index.html', {'auctions': auctions, 'currency': currency}, status=200)
+        return render(request, 'index.html', {'auctions': page, 'cards': render_cards(request, page, currency),
+                                              'currency': currency}, status=200)
 
 
 def search(request):
-    if request.GET['term'].lower() != '':
-        criteria = request.GET['term'].lower().strip()
-        if request.user.is_superuser:
-            auctions = AuctionModel.objects.filter(title__contains=criteria)
-        else:
-            auctions = AuctionModel.objects.filter(title__contains=criteria, status=AuctionModel.ACTIVE)
+    if request.user.is_superuser:
+        auctions = AuctionModel.objects.all()
+        statuses = None
     else:
-        if request.user.is_superuser:
-            auctions = AuctionModel.objects.all()
-        else:
-            auctions = AuctionModel.objects.filter(status=AuctionModel.ACTIVE)
+        auctions = AuctionModel.objects.filter(status=AuctionModel.ACTIVE)
+        statuses = [AuctionModel.ACTIVE]
+
+    auctions, currency = with_prices(auctions.select_related('seller'), get_currency(request))
+    criteria = request.GET['term'].lower().strip()
+    page = find_page(criteria, auctions, statuses, request.GET.get('cursor'), page_size(request))
 
-    currency = set_currencies(request, auctions)
-    return render(request, "index.html", {'auctions': auctions, 'search': True, 'currency': currency}, status=200)
+    return render(request, "index.html", {'auctions': page, 'cards': render_cards(request, page, currency),
+                                          'search': True, 'term': criteria, 'currency': currency}, status=200)
 
 
 @method_decorator(login_required, name='dispatch')
@@ -68,26 +81,25 @@ class CreateAuction(View):
             if minimum_price < 0.01:
                 return render(request, 'createAuction.html', {'form': form, 'err': 'min'}, status=200)
 
-            user = User.objects.get(username=request.user)
-            auction = AuctionModel(seller=user.id, title=cd['title'], description=cd['description'],
-                                   minimum_price=minimum_price, deadline_date=make_aware(deadline_date),
-                                   highest_bid=minimum_price)
-            auction.save()
-
-            signed_url = request.get_host() + reverse('auction:edit_signed', args=(signing.dumps({
-                "username": user.username,
-                "auction": auction.id
-            }),))
-
-            msg = EmailMessage(
-                'Auction has been created successfully',
-                'Auction has been created successfully. This is the link to your <a href="' +
-                signed_url + '">auction</a>',
-                'yaas-no-reply@yaas.com',
-                [User.objects.get(username=request.user).email]
-            )
-            msg.content_subtype = "html"
-            msg.send()
+            user = request.user
+            with transaction.atomic():
+                auction = AuctionModel(seller=user, title=cd['title'], description=cd['description'],
+                                       minimum_price=minimum_price, deadline_date=make_aware(deadline_date),
+                                       highest_bid=minimum_price)
+                auction.save()
+
+                signed_url = request.get_host() + reverse('auction:edit_signed', args=(signing.dumps({
+                    "username": user.username,
+                    "auction": auction.id
+                }),))
+
+                queue_mail(
+                    'Auction has been created successfully',
+                    'Auction has been created successfully. This is the link to your <a href="' +
+                    signed_url + '">auction</a>',
+                    [user.email],
+                    html=True
+                )
 
             return HttpResponseRedirect(reverse('auction:success', args=("create",)), status=302)
         else:
@@ -103,15 +115,18 @@ def success(request, param):
         return generate_response("You has bid successfully")
     elif param == "ban":
         return generate_response("Ban successfully")
+    elif param == "proxy":
+        return generate_response("Your maximum bid has been registered")
+    elif param == "outbid":
+        return generate_response("Your bid has been placed, but the maximum bid of another bidder outbid it")
 
 
 @method_decorator(login_required, name='dispatch')
 class EditAuction(View):
     def get(self, request, auction_id):
-        user = User.objects.get(username=request.user)
         auction = AuctionModel.objects.get(id=auction_id)
 
-        if auction.seller is not user.id:
+        if auction.seller_id != request.user.id:
             return HttpResponseRedirect(reverse('auction:forbidden'), status=302)
         else:
             return render(request, 'editAuction.html', {'form': EditAuctionForm(initial={
@@ -120,18 +135,18 @@ class EditAuction(View):
             }), 'id': auction.id}, status=200)
 
     def post(self, request, auction_id):
-        user = User.objects.get(username=request.user)
         auction = AuctionModel.objects.get(id=auction_id)
 
-        if auction.seller is not user.id:
+        if auction.seller_id != request.user.id:
             return HttpResponseRedirect(reverse('auction:forbidden'), status=302)
         else:
             form = EditAuctionForm(request.POST)
             if form.is_valid():
                 cd = form.cleaned_data
+                # only the edited columns, a bid that commits in between keeps its highest bid and version
                 auction.description = cd['description']
-                auction.version = auction.version + 1
-                auction.save()
+                auction.version = F('version') + 1
+                auction.save(update_fields=['description', 'version'])
 
                 return HttpResponseRedirect(reverse('auction:success', args=("edit",)), status=302)
             else:
@@ -167,8 +182,8 @@ class EditSigned(View):
         if form.is_valid():
             cd = form.cleaned_data
             auction.description = cd['description']
-            auction.version = auction.version + 1
-            auction.save()
+            auction.version = F('version') + 1
+            auction.save(update_fields=['description', 'version'])
 
             return HttpResponseRedirect(reverse('auction:success', args=("edit",)), status=302)
         else:
@@ -184,101 +199,98 @@ def edit_auction_error(request):
 
 @login_required()
 def bid(request, auction_id):
-    user = User.objects.get(username=request.user)
-    auction = AuctionModel.objects.get(id=auction_id)
-    amount = float("{0:.2f}".format(float(request.POST['new_price'])))
+    amount = Money.parse(request.POST['new_price'])
+    version = int(request.POST["version"]) if "version" in request.POST else None
 
-    if "version" in request.POST:
-        if int(request.POST["version"]) != auction.version:
-            return render(request, 'bidVersioning.html', {'auction': auction}, status=200)
+    # the bid commits on its own, in a transaction that already read SQLite cannot upgrade to the write lock
+    result = submit_bid(auction_id, request.user, amount, version)
+    auction = result.auction
 
-    if auction.seller is user.id:
-        return generate_response("You cannot bid on your own auctions")
+    # a registered maximum of another bidder may have answered the bid before it returned
+    leading = auction.highest_bidder_id == request.user.id
 
-    if auction.status != AuctionModel.ACTIVE:
-        return generate_response("You can only bid on active auctions")
+    if result.accepted:
+        with transaction.atomic():
+            queue_seller_notification(auction, result.bid, 'Auction has been bid')
+
+            if leading:
+                queue_mail(
+                    'You have bid an auction',
+                    'You have the highest bid to auction #' + str(auction.id),
+                    [request.user.email]
+                )
+
+    if result.status == BidResult.CONFLICT:
+        auction.refresh_from_db()
+        return render(request, 'bidVersioning.html', {'auction': auction}, status=200)
 
-    if auction.deadline_date < datetime.now(timezone.utc):
+    if result.status == BidResult.OWN_AUCTION:
+        return generate_response("You cannot bid on your own auctions")
+
+    if result.status == BidResult.INACTIVE:
         return generate_response("You can only bid on active auctions")
 
-    if int(amount * 100) < int(auction.highest_bid * 100) + 1:
+    if result.status == BidResult.OUTBID:
         return generate_response("New bid must be greater than the current bid for at least 0.01")
 
-    auction.highest_bid = amount
-    auction.highest_bidder = user.id
-    bidders = json.loads(auction.bidders)
-    bidders.append(user.id)
-    auction.bidders = json.dumps(bidders)
-    auction.version = auction.version + 1
-    auction.save()
-
-    send_mail(
-        'Auction has been bid',
-        'Auction #' + str(auction.id) + ' has a new highest bid',
-        'yaas-no-reply@yaas.com',
-        [User.objects.get(id=auction.seller).email],
-        fail_silently=False,
-    )
-
-    send_mail(
-        'You have bid an auction',
-        'You have the highest bid to auction #' + str(auction.id),
-        'yaas-no-reply@yaas.com',
-        [User.objects.get(id=user.id).email],
-        fail_silently=False,
-    )
+    if not leading:
+        return HttpResponseRedirect(reverse('auction:success', args=("outbid",)), status=302)
 
     return HttpResponseRedirect(reverse('auction:success', args=("bid",)), status=302)
 
 
 @require_POST
 @login_required()
-def ban(request, auction_id):
-    user = User.objects.get(username=request.user)
-    auction = AuctionModel.objects.get(id=auction_id)
+def proxy(request, auction_id):
+    try:
+        maximum = Money.parse(request.POST['max_price'])
+        version = int(request.POST["version"]) if "version" in request.POST else None
+    except (KeyError, ValueError, InvalidOperation):
+        return generate_response("Maximum bid must be a number")
 
-    if not user.is_superuser:
+    result = place_max_bid(auction_id, request.user, maximum, version)
+
+    if result.status == BidResult.CONFLICT:
+        return render(request, 'bidVersioning.html', {'auction': result.auction}, status=200)
+
+    if result.status == BidResult.OWN_AUCTION:
+        return generate_response("You cannot bid on your own auctions")
+
+    if result.status == BidResult.INACTIVE:
+        return generate_response("You can only bid on active auctions")
+
+    if result.status == BidResult.OUTBID:
+        return generate_response("Maximum bid must be greater than the current bid for at least 0.01")
+
+    return HttpResponseRedirect(reverse('auction:success', args=("proxy",)), status=302)
+
+
+@require_POST
+@login_required()
+def ban(request, auction_id):
+    if not request.user.is_superuser:
         return HttpResponseRedirect(reverse('index'), status=302)
 
+    auction = AuctionModel.objects.get(id=auction_id)
+
     auction.status = AuctionModel.BANNED
-    bidders = json.loads(auction.bidders)
-    bidders.append(auction.seller)
-    for user_id in bidders:
-        send_mail(
-            'Auction banned',
-            'Auction #' + str(auction.id) + ' has been banned',
-            'yaas-no-reply@yaas.com',
-            [User.objects.get(id=user_id).email],
-            fail_silently=False,
-        )
-    auction.save()
+    auction.version = F('version') + 1
+    bidders = list(auction.bids.values_list('bidder_id', flat=True).distinct())
+    bidders.append(auction.seller_id)
+    with transaction.atomic():
+        # like the resolver, a ban writes the status and bumps the version without touching the bid columns
+        auction.save(update_fields=['status', 'version'])
+        if listening():
+            auction.refresh_from_db(fields=['highest_bid', 'version'])
+            publish(auction)
+        queue_notification(bidders, 'Auction banned', 'Auction #' + str(auction.id) + ' has been banned')
 
     return HttpResponseRedirect(reverse('auction:success', args=("ban",)), status=302)
 
 
 def resolve(request):
-    auctions_active = AuctionModel.objects.filter(status=AuctionModel.ACTIVE)
-    auctions_resolved = []
-
-    for auction in auctions_active:
-        if auction.deadline_date < datetime.now(timezone.utc):
-            bidders = json.loads(auction.bidders)
-            bidders.append(auction.seller)
-            for user_id in bidders:
-                send_mail(
-                    'Auction resolved',
-                    'Auction #' + str(auction.id) + ' has been banned',
-                    'yaas-no-reply@yaas.com',
-                    [User.objects.get(id=user_id).email],
-                    fail_silently=False,
-                )
-
-            if auction.highest_bidder == -1:
-                auction.status = AuctionModel.DUE
-            else:
-                auction.status = AuctionModel.ADJUDECATED
-            auction.save()
-            auctions_resolved.append(auction.title)
+    resolved = [auction for chunk in resolve_expired() for auction in chunk]
+    auctions_resolved = [auction['title'] for auction in sorted(resolved, key=lambda auction: auction['id'])]
 
     return HttpResponse(json.dumps({'resolved_auctions': auctions_resolved}), content_type="application/json",
                         status=200)
@@ -295,9 +307,7 @@ def changeLanguage(request, lang_code):
             response = generate_response("Language has been changed to Swedish")
 
         if request.user.is_authenticated:
-            user = User.objects.get(username=request.user)
-            user.language.language = lang_code
-            user.save()
+            Language.objects.filter(user=request.user).update(language=lang_code)
 
         translation.activate(lang_code)
         response.set_cookie(LANGUAGE_COOKIE_NAME, lang_code)
@@ -308,17 +318,14 @@ def changeLanguage(request, lang_code):
 
 @require_GET
 def changeCurrency(request, currency_code):
-    supported_currencies = ['eur', 'usd']
-    if currency_code.lower() in supported_currencies:
-        if currency_code.lower() == 'eur':
-            response = generate_response("Currency has been changed to EUR")
-            response.set_cookie(CURRENCY_COOKIE_NAME, "0")
-        else:
-            response = requests.get(CURRENCY_API)
-            rate = response.json()['quotes']['USDEUR']
-            response = generate_response("Currency has been changed to USD")
-            response.set_cookie(CURRENCY_COOKIE_NAME, rate)
-
+    currency_code = currency_code.lower()
+    if currency_code in settings.CURRENCIES:
+        if currency_code not in currency_rates():
+            return generate_response("Currency exchange is not available at the moment")
+
+        # the cookie keeps the currency, prices are converted with the current rate on every request
+        response = generate_response("Currency has been changed to " + currency_code.upper())
+        response.set_cookie(CURRENCY_COOKIE_NAME, currency_code)
         return response
     else:
         return HttpResponseRedirect(reverse('index'), status=302)
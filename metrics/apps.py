@@ -0,0 +1,12 @@
+import atexit
+
+from django.apps import AppConfig
+
+
+class MetricsConfig(AppConfig):
+    name = 'metrics'
+    verbose_name = 'Metrics'
+
+    def ready(self):
+        from metrics.registry import flush
+        atexit.register(flush, force=True)
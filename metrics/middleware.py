@@ -0,0 +1,45 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from metrics.registry import flush, inc, observe
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status, SQL queries and response size of every request under the name of the url it resolved to.
+    Goes first in MIDDLEWARE so the time spent in the other middleware is counted too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0, 0.0]
+
+        def count_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries[0] += 1
+                queries[1] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        observe('yaas_request_duration_seconds', elapsed, view=view)
+        inc('yaas_requests_total', view=view, status=response.status_code)
+        inc('yaas_sql_queries_total', queries[0], view=view)
+        inc('yaas_sql_duration_seconds_total', queries[1], view=view)
+        if not response.streaming:
+            inc('yaas_response_bytes_total', len(response.content), view=view)
+        flush()
+        return response
@@ -0,0 +1,157 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+FAMILIES = {
+    'yaas_request_duration_seconds': ('histogram', 'Request latency by view'),
+    'yaas_requests_total': ('counter', 'Requests by view and status'),
+    'yaas_sql_queries_total': ('counter', 'SQL queries run by view'),
+    'yaas_sql_duration_seconds_total': ('counter', 'Time spent in SQL queries by view'),
+    'yaas_response_bytes_total': ('counter', 'Response body bytes by view, streamed responses are not counted'),
+    'yaas_external_duration_seconds': ('histogram', 'Time spent on outbound HTTP calls and sending mail'),
+}
+
+# every series is a float keyed by its Prometheus name and labels, so processes are merged by adding them up
+_series = defaultdict(float)
+_lock = threading.Lock()
+_pid = os.getpid()
+_flushed_at = 0
+_histogram_key_cache = {}
+
+
+def _key(name, labels):
+    if not labels:
+        return name
+    pairs = ('%s="%s"' % (label, str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n'))
+             for label, value in sorted(labels.items()))
+    return '%s{%s}' % (name, ','.join(pairs))
+
+
+def _reset_after_fork():
+    # a forked worker starts with a copy of the parent's series, which the parent reports already
+    global _pid
+    if os.getpid() != _pid:
+        _pid = os.getpid()
+        _series.clear()
+
+
+def inc(name, value=1, **labels):
+    with _lock:
+        _reset_after_fork()
+        _series[_key(name, labels)] += value
+
+
+def _histogram_keys(name, labels):
+    cache_key = (name, tuple(sorted(labels.items())))
+    keys = _histogram_key_cache.get(cache_key)
+    if keys is None:
+        keys = _histogram_key_cache[cache_key] = (
+            [_key(name + '_bucket', dict(labels, le=bound)) for bound in LATENCY_BUCKETS + ('+Inf',)],
+            _key(name + '_sum', labels),
+            _key(name + '_count', labels)
+        )
+    return keys
+
+
+def observe(name, seconds, **labels):
+    """Add one observation to the histogram `name`."""
+    buckets, total, count = _histogram_keys(name, labels)
+    first = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+    with _lock:
+        _reset_after_fork()
+        if buckets[0] not in _series:
+            # adds every bucket in increasing order, the order they are rendered in
+            for key in buckets:
+                _series[key] = 0
+        # buckets are cumulative, every bucket from the first bound at or above `seconds` counts it
+        for key in buckets[first:]:
+            _series[key] += 1
+        _series[total] += seconds
+        _series[count] += 1
+
+
+@contextmanager
+def timed(kind, target):
+    """Time an outbound call, `kind` is 'http' or 'mail'."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('yaas_external_duration_seconds', time.perf_counter() - started, kind=kind, target=target)
+        flush()
+
+
+def _path(pid):
+    return os.path.join(settings.METRICS_DIR, 'metrics_%d.json' % pid)
+
+
+def flush(force=False):
+    """
+    Write the series of this process to METRICS_DIR, at most every METRICS_FLUSH_INTERVAL seconds unless forced, so
+    /metrics in any process can add up all of them.
+    """
+    global _flushed_at
+    if not settings.METRICS_DIR or (not force and time.monotonic() - _flushed_at < settings.METRICS_FLUSH_INTERVAL):
+        return
+    _flushed_at = time.monotonic()
+
+    with _lock:
+        _reset_after_fork()
+        data = json.dumps(_series)
+    path = _path(_pid)
+    with open(path + '.tmp', 'w') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def collect():
+    """The series of this process added to the ones flushed by every other process."""
+    with _lock:
+        _reset_after_fork()
+        merged = defaultdict(float, _series)
+
+    if settings.METRICS_DIR:
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, 'metrics_*.json')):
+            if path == _path(_pid):
+                continue
+            try:
+                with open(path) as f:
+                    series = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for key, value in series.items():
+                merged[key] += value
+    return merged
+
+
+def _family(key):
+    name = key.split('{', 1)[0]
+    for suffix in ('_bucket', '_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in FAMILIES:
+            return name[:-len(suffix)]
+    return name
+
+
+def render(gauges=None):
+    """Prometheus text format of every series plus the given {name: (help, value)} gauges."""
+    families = defaultdict(list)
+    for key, value in collect().items():
+        families[_family(key)].append('%s %s' % (key, repr(float(value))))
+
+    lines = []
+    for name in sorted(families):
+        kind, description = FAMILIES.get(name, ('untyped', ''))
+        lines += ['# HELP %s %s' % (name, description), '# TYPE %s %s' % (name, kind)]
+        lines += families[name]
+    for name, (description, value) in sorted((gauges or {}).items()):
+        lines += ['# HELP %s %s' % (name, description), '# TYPE %s gauge' % name, '%s %s' % (name, repr(float(value)))]
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from metrics.registry import render
+from tasks.queue import queue_stats
+
+
+@require_GET
+def metrics(request):
+    if settings.METRICS_ALLOWED_IPS is not None and request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+
+    stats = queue_stats()
+    gauges = {
+        'yaas_task_queue_depth': ('Pending background tasks', stats['depth']),
+        'yaas_task_queue_running': ('Background tasks being run', stats['running']),
+        'yaas_task_queue_failed': ('Background tasks that gave up', stats['failed']),
+        'yaas_task_queue_lag_seconds': ('Age of the oldest due task', stats['lag'])
+    }
+    return HttpResponse(render(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,49 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks.queue import run_pending, queue_stats
+
+
+class Command(BaseCommand):
+    help = 'Drains the background task queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--batch', type=int, default=100, help='tasks claimed per poll')
+        parser.add_argument('--poll', type=float, default=1.0, help='seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='exit once no task is due')
+        parser.add_argument('--stats', action='store_true', help='print queue depth and lag and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for key, value in queue_stats().items():
+                self.stdout.write('%s: %s' % (key, value))
+            return
+
+        if options['processes'] <= 1:
+            self.work(options)
+            return
+
+        # children must not share the parent's database connection
+        connections.close_all()
+        workers = [multiprocessing.get_context('fork').Process(target=self.work, args=(options,))
+                   for i in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    def work(self, options):
+        try:
+            while True:
+                if not run_pending(options['batch']):
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connections.close_all()
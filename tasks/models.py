@@ -0,0 +1,24 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    PENDING = 'PE'
+    RUNNING = 'RU'
+    FAILED = 'FA'
+    STATUSES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed')
+    ]
+    name = models.CharField(max_length=128)
+    payload = models.TextField(default="{}")
+    status = models.CharField(max_length=2, choices=STATUSES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True)
+    last_error = models.TextField(default="")
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'])]
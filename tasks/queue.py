@@ -0,0 +1,89 @@
+import json
+import logging
+import traceback
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Min
+from django.utils import timezone
+
+from tasks.models import Task
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def task(name):
+    """Register the decorated function as the handler for tasks called `name`."""
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, run_at=None, **payload):
+    """
+    Store a task in the outbox. Call it inside the transaction of the write it belongs to, so the task exists if and
+    only if the write commits. With TASK_QUEUE_EAGER, meant for development and the tests, the handler runs right away
+    in this process instead, unless the task is delayed.
+    """
+    if name not in _handlers:
+        raise KeyError("No handler registered for task '%s'" % name)
+
+    if settings.TASK_QUEUE_EAGER and run_at is None:
+        _handlers[name](**payload)
+        return None
+
+    return Task.objects.create(name=name, payload=json.dumps(payload, cls=DjangoJSONEncoder),
+                               run_at=run_at or timezone.now())
+
+
+def run_pending(limit=100):
+    """Claim and run up to `limit` due tasks, returns the number of tasks that were run."""
+    now = timezone.now()
+    stale = now - timezone.timedelta(seconds=settings.TASK_LOCK_TIMEOUT)
+    Task.objects.filter(status=Task.RUNNING, locked_at__lt=stale).update(status=Task.PENDING, locked_at=None)
+
+    due = Task.objects.filter(status=Task.PENDING, run_at__lte=now).order_by('run_at').values_list('id', flat=True)
+    ran = 0
+    for task_id in list(due[:limit]):
+        # claiming is a conditional update, so concurrent workers never run the same task twice
+        claimed = Task.objects.filter(id=task_id, status=Task.PENDING)\
+            .update(status=Task.RUNNING, locked_at=timezone.now(), attempts=F('attempts') + 1)
+        if claimed:
+            _run(Task.objects.get(id=task_id))
+            ran += 1
+    return ran
+
+
+def _run(task_obj):
+    try:
+        _handlers[task_obj.name](**json.loads(task_obj.payload))
+    except Exception:
+        logger.exception("Task %s #%d failed", task_obj.name, task_obj.id)
+        task_obj.last_error = traceback.format_exc()
+        task_obj.locked_at = None
+        if task_obj.attempts >= settings.TASK_MAX_ATTEMPTS:
+            task_obj.status = Task.FAILED
+        else:
+            task_obj.status = Task.PENDING
+            task_obj.run_at = timezone.now() + timezone.timedelta(
+                seconds=settings.TASK_RETRY_BACKOFF * 2 ** (task_obj.attempts - 1))
+        task_obj.save()
+    else:
+        task_obj.delete()
+
+
+def queue_stats():
+    """Queue depth and lag in seconds of the oldest task that is due but not yet run."""
+    now = timezone.now()
+    pending = Task.objects.filter(status=Task.PENDING)
+    oldest = pending.filter(run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+
+    return {
+        'depth': pending.count(),
+        'running': Task.objects.filter(status=Task.RUNNING).count(),
+        'failed': Task.objects.filter(status=Task.FAILED).count(),
+        'lag': (now - oldest).total_seconds() if oldest else 0
+    }
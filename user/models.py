@@ -16,6 +16,9 @@ def create_user_language(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_user_language(sender, instance, **kwargs):
-    instance.language.save()
+def save_user_language(sender, instance, created, **kwargs):
+    # only a language that was loaded can have changed, this keeps saves like the last_login update on sign in to one
+    # query
+    if not created and User.language.is_cached(instance):
+        instance.language.save()
 
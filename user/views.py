@@ -41,8 +41,7 @@ class SignUp(View):
                         'username_taken': False
                     }, status=200)
                 except User.DoesNotExist:
-                    user = User.objects.create_user(cd['username'], cd['email'], cd['password'])
-                    user.save()
+                    User.objects.create_user(cd['username'], cd['email'], cd['password'])
 
                     return HttpResponseRedirect(reverse('index'), status=302)
         else:
@@ -104,14 +103,14 @@ class EditProfile(View):
                     User.objects.get(email=cd['email'])
                     return render(request, 'profile.html', {'form': CreateEditAccountForm()}, status=200)
                 except User.DoesNotExist:
-                    user = User.objects.get(username=request.user)
+                    user = request.user
                     user.email = cd['email']
-                    user.save()
+                    user.save(update_fields=['email'])
 
             if cd['password']:
-                user = User.objects.get(username=request.user)
+                user = request.user
                 user.set_password(cd['password'])
-                user.save()
+                user.save(update_fields=['password'])
                 update_session_auth_hash(request, user)
 
             return HttpResponseRedirect(reverse('user:user'), status=302)
@@ -0,0 +1,24 @@
+"""
+ASGI config for yaas, it only serves the live bid updates at /events/.
+
+Django 2.2 has no ASGI handler, every other URL stays with the WSGI application. Run it with any ASGI server next to
+the WSGI workers and `manage.py run_event_broker`, for example ``uvicorn yaas.asgi:application``.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yaas.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.exceptions import ImproperlyConfigured  # noqa: E402
+
+from auction.live import EventStreamApp  # noqa: E402
+
+# the bids are written by the WSGI workers, their events only reach this process through the broker
+if not settings.LIVE_EVENTS_BROKER:
+    raise ImproperlyConfigured('Set LIVE_EVENTS_BROKER to the (host, port) of `manage.py run_event_broker`')
+
+application = EventStreamApp()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 from django.urls import reverse_lazy
@@ -29,11 +30,57 @@ SECRET_KEY = ''
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Whether this process runs the test suite
+TESTING = sys.argv[1:2] == ['test']
+
 ALLOWED_HOSTS = []
 
 # Email mocking
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+# Background tasks
+# Tasks are stored in an outbox drained by `manage.py run_tasks`. Eager mode runs them inline as they are queued, in
+# the request that queued them, which the tests rely on
+TASK_QUEUE_EAGER = TESTING
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_BACKOFF = 30  # seconds, doubled on every retry
+TASK_LOCK_TIMEOUT = 600  # seconds before a task claimed by a dead worker is retried
+
+# Auctions per page of listings and APIs, clients can ask for up to MAX_PAGE_SIZE with ?page_size=
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Rows fetched per database round trip when streaming the browse API
+STREAM_CHUNK_SIZE = 500
+
+# Most relevant matches returned by a full-text search
+SEARCH_MAX_RESULTS = 500
+
+# Messages sent per mail connection round when notifying many users at once
+NOTIFICATION_BATCH_SIZE = 100
+
+# Bids go through one writer thread per auction in every process, which writes the bids queued in the meantime in one
+# transaction. Pays off when many bids hit the same auctions, compare with `manage.py bench_bids --sequencer`
+BID_SEQUENCER = False
+BID_SEQUENCER_THREADS = 4
+BID_SEQUENCER_BATCH_SIZE = 200
+BID_SEQUENCER_CACHE_SIZE = 10000  # auctions kept in memory by every thread
+BID_SEQUENCER_TIMEOUT = 10  # seconds a request waits for its bid to be written
+
+# Seconds of new bids summed up in one message to the seller, None mails the seller on every bid. The digests are
+# delayed tasks, so they need the `run_tasks` worker, and a cache shared by the workers to open one window per seller
+SELLER_DIGEST_WINDOW = None
+
+# Live bid updates
+# Server-Sent Events at /events/?auction=<id> are served by the ASGI app in yaas/asgi.py, next to the WSGI workers.
+# Every bid, ban and resolve is sent over UDP to LIVE_EVENTS_BROKER (`manage.py run_event_broker`) once it commits,
+# which forwards it to every ASGI process. The ASGI app refuses to start without it, the writes happen in the WSGI
+# workers. None leaves the writers without the publishing work when nothing streams
+LIVE_EVENTS_BROKER = None  # (host, port), e.g. ('127.0.0.1', 8765)
+LIVE_EVENTS_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+LIVE_EVENTS_QUEUE_SIZE = 32  # events kept for a slow client, the oldest are dropped first
+LIVE_EVENTS_MAX_AUCTIONS = 100  # auctions one stream can follow
+
 
 # Application definition
 PREREQ_APPS = [
@@ -49,12 +96,15 @@ PREREQ_APPS = [
 
 PROJECT_APPS = [
     'auction.apps.AuctionConfig',
-    'user.apps.UserConfig'
+    'user.apps.UserConfig',
+    'tasks.apps.TasksConfig',
+    'metrics.apps.MetricsConfig'
 ]
 
 INSTALLED_APPS = PREREQ_APPS + PROJECT_APPS
 
 MIDDLEWARE = [
+    'metrics.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -79,7 +129,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'django.template.context_processors.i18n'
+                'django.template.context_processors.i18n',
+                'auction.context_processors.currency'
             ],
         },
     },
@@ -88,6 +139,44 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yaas.wsgi.application'
 
 
+# Cache
+# Per-process memory caches, use a shared backend (memcached) when running several workers. The rendered auction cards
+# churn through a cache of their own, so they never cull the rates and counters kept in the default one
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'cards': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auction-cards',
+        # a card per auction, currency, language and admin view, compare with `manage.py bench_render`
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
+# Seconds a rendered auction card is kept, its cache key changes whenever the auction does
+AUCTION_CARD_CACHE_TIMEOUT = 3600
+
+
+# API tokens
+# Resolved tokens are kept in every process for API_TOKEN_CACHE_TTL seconds. A deleted token is dropped at once in the
+# process that deleted it, and in the others on their next request when the cache above is shared
+
+API_TOKEN_CACHE_TTL = 300
+API_TOKEN_CACHE_SIZE = 10000
+
+
+# Metrics
+# Served at /metrics. With several worker processes every process writes its series to METRICS_DIR (a directory
+# shared by them, emptied on deploy) at most every METRICS_FLUSH_INTERVAL seconds, and /metrics adds them up
+
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # None to allow every address
+
+
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
@@ -136,8 +225,20 @@ LANGUAGE_COOKIE_NAME = 'lang'
 
 CURRENCY_API = ""
 
+# Quotes are served from the cache, after EXCHANGE_RATE_TTL seconds they are refreshed by a background task. Without
+# CURRENCY_API only the base currency is offered, the fixed quotes of the stub are for development and the tests
+EXCHANGE_RATE_PROVIDER = ('auction.rates.CurrencyLayerProvider' if CURRENCY_API else
+                          'auction.rates.StubProvider' if DEBUG or TESTING else None)
+EXCHANGE_RATE_TTL = 3600
+EXCHANGE_RATE_TIMEOUT = 3
+
 CURRENCY_COOKIE_NAME = 'RATE'
 
+# Prices are stored in BASE_CURRENCY and converted to the display currency with the cached exchange rates
+BASE_CURRENCY = 'eur'
+
+CURRENCIES = ['eur', 'usd', 'gbp', 'sek']
+
 TIME_ZONE = 'UTC'
 
 USE_I18N = True
@@ -0,0 +1,1300 @@
+import asyncio
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import call_command, CommandError
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import connection, connections, transaction, OperationalError
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from auction.authentication import _remember, forget, revocations, REVOCATION_KEY
+from auction.bidding import place_bid, place_max_bid, BidResult
+from auction.currency import with_prices
+from auction.generator import generate
+from auction.live import EventBroker, EventStreamApp, Hub, SUBSCRIBE, register, unregister
+from auction.money import Money, MoneyFormField
+from auction.models import AuctionModel, Bid, ProxyBid
+from auction.pagination import encode_cursor, NEXT, RANKED
+from auction.notifications import notify_users
+from auction.rates import get_quotes, StubProvider, RATES_KEY
+from auction.resolver import resolve_chunk, resolve_expired
+from auction.scheduler import DeadlineScheduler
+from auction.search import search_ids, get_index, InvertedIndex, Fts5Index
+from auction.tasks import queue_mail
+from auction.sequencer import BidSequencer
+from metrics import registry
+from tasks.models import Task
+from tasks.queue import run_pending, queue_stats, task, enqueue
+
+
+class SlowEmailBackend(EmailBackend):
+    """Stand-in for an SMTP server that takes a second per connection"""
+
+    def send_messages(self, messages):
+        time.sleep(1)
+        return super().send_messages(messages)
+
+
+@contextmanager
+def committed():
+    """An atomic block that runs its on_commit callbacks on a clean exit, the transaction of TestCase never commits"""
+    start = len(connection.run_on_commit)
+    with transaction.atomic():
+        yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for _, callback in callbacks:
+        callback()
+
+
+@task('tests.fail')
+def failing_task():
+    raise RuntimeError("SMTP is down")
+
+
+class BidEngineTest(TestCase):
+    """Test for the compare-and-swap bid engine"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@mail.com", "123")
+        self.bidder1 = User.objects.create_user("bidder1", "bidder1@mail.com", "123")
+        self.bidder2 = User.objects.create_user("bidder2", "bidder2@mail.com", "123")
+        self.auction = AuctionModel.objects.create(seller=self.seller, title="item1", description="something",
+                                                   minimum_price=10, highest_bid=10,
+                                                   deadline_date=timezone.now() + timezone.timedelta(days=5))
+
+    def test_accepted_bid_updates_row(self):
+        result = place_bid(self.auction.id, self.bidder1, 10.01)
+        self.assertEqual(result.status, BidResult.ACCEPTED)
+
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.highest_bid, 10.01)
+        self.assertEqual(self.auction.highest_bidder_id, self.bidder1.id)
+        self.assertEqual(self.auction.version, 1)
+        self.assertEqual(self.auction.bid_count, 1)
+
+        place_bid(self.auction.id, self.bidder2, 11)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.bid_count, 2)
+        self.assertEqual(list(self.auction.bids.order_by('id').values_list('bidder_id', 'amount')),
+                         [(self.bidder1.id, 10.01), (self.bidder2.id, 11)])
+
+    def test_too_low_bid_is_outbid(self):
+        result = place_bid(self.auction.id, self.bidder1, 10)
+        self.assertEqual(result.status, BidResult.OUTBID)
+
+    def test_cent_increment_is_exact(self):
+        # int(0.29 * 100) is 28, a float comparison took 0.29 for less than 0.29
+        AuctionModel.objects.filter(id=self.auction.id).update(highest_bid=Money.parse("0.28"))
+        self.assertEqual(place_bid(self.auction.id, self.bidder1, "0.29").status, BidResult.ACCEPTED)
+        self.assertEqual(place_bid(self.auction.id, self.bidder2, 0.29).status, BidResult.OUTBID)
+        self.assertEqual(AuctionModel.objects.values_list("highest_bid", flat=True).get(), Money(29))
+
+    def test_lost_race_is_outbid(self):
+        stale = AuctionModel.objects.get(id=self.auction.id)
+        place_bid(self.auction.id, self.bidder1, 20)
+
+        # the second bidder validated against the row as it was before the first bid landed
+        with mock.patch.object(AuctionModel.objects, 'get', return_value=stale):
+            result = place_bid(self.auction.id, self.bidder2, 15)
+
+        self.assertEqual(result.status, BidResult.OUTBID)
+        self.auction.refresh_from_db()
+        self.assertEqual(self.auction.highest_bid, 20)
+        self.assertEqual(self.auction.highest_bidder_id, self.bidder1.id)
+
+    def test_stale_version_is_conflict(self):
+        place_bid(self.auction.id, self.bidder1, 11)
+
+        result = place_bid(self.auction.id, self.bidder2, 12, version=0)
+        self.assertEqual(result.status, BidResult.CONFLICT)
+
+    def test_own_and_inactive_auction(self):
+        self.assertEqual(place_bid(self.auction.id, self.seller, 11).status, BidResult.OWN_AUCTION)
+
+        AuctionModel.objects.filter(id=self.auction.id).update(status=AuctionModel.BANNED)
+        self.assertEqual(place_bid(self.auction.id, self.bidder1, 11).status, BidResult.INACTIVE)
+
+    def test_edit_and_ban_keep_a_bid_that_landed_in_between(self):
+        admin = User.objects.create_superuser("admin", "admin@mail.com", "123")
+        for user, url, data, amount in [
+                (self.seller, reverse("auction:edit", args=(self.auction.id,)),
+                 {"title": "item1", "description": "new"}, 20),
+                (admin, reverse("auction:ban", args=(self.auction.id,)), {}, 30)]:
+            stale = AuctionModel.objects.get(id=self.auction.id)
+            place_bid(self.auction.id, self.bidder1 if amount == 20 else self.bidder2, amount)
+
+            # the view loaded the row before the bid committed
+            self.client.force_login(user)
+            with mock.patch.object(AuctionModel.objects, 'get', return_value=stale):
+                self.assertEqual(self.client.post(url, data).status_code, 302)
+
+        self.auction.refresh_from_db()
+        self.assertEqual((self.auction.highest_bid, self.auction.highest_bidder_id, self.auction.bid_count),
+                         (30, self.bidder2.id, 2))
+        self.assertEqual((self.auction.description, self.auction.status, self.auction.version),
+                         ("new", AuctionModel.BANNED, 4))
+
+
+@override_settings(TASK_QUEUE_EAGER=False, EMAIL_BACKEND='yaas.testPerformance.SlowEmailBackend')
+class TaskQueueTest(TestCase):
+    """Test for sending mail through the background task queue"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user("seller", "seller@mail.com", "123")
+        self.bidder = User.objects.create_user("bidder", "bidder@mail.com", "123")
+        self.auction = AuctionModel.objects.create(seller=self.seller, title="item1", description="something",
+                                                   minimum_price=10, highest_bid=10,
+                                                   deadline_date=timezone.now() + timezone.timedelta(days=5))
+
+    def test_bid_does_not_wait_for_mail(self):
+        self.client.force_login(self.bidder)
+
+        started = time.perf_counter()
+        response = self.client.post(reverse("auction:bid", args=(self.auction.id,)), {"new_price": 12})
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(response.status_code, 302)
+        self.assertLess(elapsed, 1)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(queue_stats()['depth'], 2)
+
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["bidder@mail.com", "seller@mail.com"])
+        self.assertEqual(queue_stats()['depth'], 0)
+
+    @override_settings(TASK_QUEUE_EAGER=True, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_eager_task_runs_right_away(self):
+        queue_mail("Auction created", "Auction #1", ["seller@mail.com"])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(Task.objects.exists())
+
+    def test_failed_task_is_retried_with_backoff(self):
+        enqueue('tests.fail')
+
+        with self.settings(TASK_MAX_ATTEMPTS=2):
+            run_pending()
+            retried = Task.objects.get()
+            self.assertEqual(retried.status, Task.PENDING)
+            self.assertEqual(retried.attempts, 1)
+            self.assertGreater(retried.run_at, timezone.now())
+            self.assertIn("SMTP is down", retried.last_error)
+
+            # not due yet
+            self.assertEqual(run_pending(), 0)
+
+            Task.objects.update(run_at=timezone.now())
+            run_pending()
+            self.assertEqual(Task.objects.get().status, Task.FAILED)
+            self.assertEqual(queue_stats()['failed'], 1)
+
+
+class NotificationFanOutTest(TestCase):
+    """Test for batched notifications to many users"""
+
+    def setUp(self):
+        self.users = [User.objects.create(username="user%d" % i, email="user%d@mail.com" % i) for i in range(30)]
+
+    def test_recipients_are_deduplicated_and_resolved_at_once(self):
+        user_ids = [user.id for user in self.users] * 3
+
+        with self.settings(NOTIFICATION_BATCH_SIZE=7), self.assertNumQueries(1):
+            sent = notify_users(user_ids, 'Auction banned', 'Auction #1 has been banned')
+
+        self.assertEqual(sent, 30)
+        self.assertEqual(len(mail.outbox), 30)
+        self.assertEqual(len(set(m.to[0] for m in mail.outbox)), 30)
+
+
+class DeadlineSchedulerTest(TestCase):
+    """Test for closing auctions at their deadline"""
+
+    def setUp(self):
+        self.seller = User.objects.create(username="seller", email="seller@mail.com")
+        self.now = timezone.now()
+
+    def create_auction(self, title, deadline_date):
+        return AuctionModel.objects.create(seller=self.seller, title=title, description="something",
+                                           minimum_price=10, highest_bid=10, deadline_date=deadline_date)
+
+    def test_auctions_are_resolved_at_their_deadline(self):
+        soon = self.create_auction("soon", self.now + timezone.timedelta(minutes=1))
+        later = self.create_auction("later", self.now + timezone.timedelta(hours=3))
+        scheduler = DeadlineScheduler(horizon=timezone.timedelta(hours=1))
+
+        self.assertEqual(scheduler.tick(self.now), [])
+        self.assertEqual(len(scheduler.heap), 1)
+
+        resolved = scheduler.tick(self.now + timezone.timedelta(minutes=2))
+        self.assertEqual([auction['id'] for auction in resolved], [soon.id])
+        soon.refresh_from_db()
+        self.assertEqual(soon.status, AuctionModel.DUE)
+
+        # created after startup, inside the window that is already loaded
+        created = self.create_auction("created", self.now + timezone.timedelta(minutes=30))
+        resolved = scheduler.tick(self.now + timezone.timedelta(minutes=31))
+        self.assertEqual([auction['id'] for auction in resolved], [created.id])
+
+        resolved = scheduler.tick(self.now + timezone.timedelta(hours=3, minutes=1))
+        self.assertEqual([auction['id'] for auction in resolved], [later.id])
+
+    def test_banned_auction_is_skipped(self):
+        banned = self.create_auction("banned", self.now + timezone.timedelta(minutes=1))
+        scheduler = DeadlineScheduler()
+        scheduler.tick(self.now)
+        AuctionModel.objects.filter(id=banned.id).update(status=AuctionModel.BANNED)
+
+        self.assertEqual(scheduler.tick(self.now + timezone.timedelta(minutes=2)), [])
+        banned.refresh_from_db()
+        self.assertEqual(banned.status, AuctionModel.BANNED)
+
+
+    def test_failed_chunk_is_due_again(self):
+        first = self.create_auction("first", self.now + timezone.timedelta(minutes=1))
+        second = self.create_auction("second", self.now + timezone.timedelta(minutes=2))
+        scheduler = DeadlineScheduler(batch_size=1)
+        scheduler.tick(self.now)
+
+        with mock.patch("auction.scheduler.resolve_chunk", side_effect=OperationalError("database is locked")):
+            self.assertRaises(OperationalError, scheduler.tick, self.now + timezone.timedelta(minutes=3))
+        self.assertEqual(len(scheduler.heap), 2)
+
+        resolved = scheduler.tick(self.now + timezone.timedelta(minutes=3))
+        self.assertEqual([auction['id'] for auction in resolved], [first.id, second.id])
+
+    def test_auction_changed_since_it_was_selected_is_left_alone(self):
+        banned = self.create_auction("banned", self.now - timezone.timedelta(minutes=1))
+        expired = self.create_auction("expired", self.now - timezone.timedelta(minutes=1))
+        chunk = list(AuctionModel.objects.filter(id__in=[banned.id, expired.id]).order_by("id")
+                     .values("id", "title", "seller", "highest_bidder"))
+        AuctionModel.objects.filter(id=banned.id).update(status=AuctionModel.BANNED)
+
+        self.assertEqual([auction["id"] for auction in resolve_chunk(chunk)], [expired.id])
+        self.assertEqual([message.body for message in mail.outbox], ["Auction #%d has been banned" % expired.id])
+        banned.refresh_from_db()
+        self.assertEqual((banned.status, banned.version), (AuctionModel.BANNED, 0))
+
+    def test_failed_resolve_worker_fails_the_command(self):
+        # the forked workers inherit the patch
+        with mock.patch("auction.management.commands.resolve_auctions.resolve_expired",
+                        side_effect=OperationalError("database is locked")):
+            with self.assertRaisesMessage(CommandError, "2 of 2 workers failed"):
+                call_command("resolve_auctions", workers=2, stdout=StringIO(), stderr=StringIO())
+
+class SearchIndexTest(TestCase):
+    """Test for the full-text auction search"""
+
+    def setUp(self):
+        seller = User.objects.create(username="seller", email="seller@mail.com")
+        deadline_date = timezone.now() + timezone.timedelta(days=5)
+        self.lamp = AuctionModel.objects.create(seller=seller, title="Red desk lamp", description="brass, works",
+                                                minimum_price=10, highest_bid=10, deadline_date=deadline_date)
+        self.desk = AuctionModel.objects.create(seller=seller, title="Oak desk", description="a red stain",
+                                                minimum_price=10, highest_bid=10, deadline_date=deadline_date)
+        self.banned = AuctionModel.objects.create(seller=seller, title="Red desk", description="stolen",
+                                                  minimum_price=10, highest_bid=10, deadline_date=deadline_date,
+                                                  status=AuctionModel.BANNED)
+
+    def assert_search(self, index):
+        active = [AuctionModel.ACTIVE]
+        self.assertEqual(index.search(["red", "desk"], active), [self.lamp.id, self.desk.id])
+        self.assertEqual(index.search(["lam"], active), [self.lamp.id])
+        self.assertEqual(index.search(["stain"], active), [self.desk.id])
+        self.assertEqual(sorted(index.search(["red"])), [self.lamp.id, self.desk.id, self.banned.id])
+        self.assertEqual(index.search(["chair"], active), [])
+
+    def test_fts5_index(self):
+        self.assert_search(Fts5Index())
+
+    def test_inverted_index(self):
+        self.assert_search(InvertedIndex())
+
+    def test_index_follows_edits(self):
+        self.desk.description = "walnut"
+        self.desk.save()
+        self.assertEqual(search_ids("stain"), [])
+        self.assertEqual(search_ids("walnut"), [self.desk.id])
+
+        self.lamp.delete()
+        self.assertEqual(search_ids("lamp"), [])
+
+
+class KeysetPaginationTest(TestCase):
+    """Test for cursor pagination of listings and APIs"""
+
+    def setUp(self):
+        seller = User.objects.create(username="seller", email="seller@mail.com")
+        deadline_date = timezone.now() + timezone.timedelta(days=5)
+        # pairs of auctions share a deadline, so the id has to break ties
+        AuctionModel.objects.bulk_create([
+            AuctionModel(seller=seller, title="item%d" % i, description="something", minimum_price=10,
+                         highest_bid=10, deadline_date=deadline_date + timezone.timedelta(hours=i // 2))
+            for i in range(25)
+        ])
+        self.expected = list(AuctionModel.objects.order_by('deadline_date', 'id').values_list('title', flat=True))
+
+    def test_walk_pages_forwards_and_backwards(self):
+        titles = []
+        pages = []
+        url = reverse("auction:index") + "?page_size=10"
+        while url:
+            response = self.client.get(url)
+            page = response.context["auctions"]
+            pages.append([auction.title for auction in page])
+            titles.extend(pages[-1])
+            url = reverse("auction:index") + "?page_size=10&cursor=" + page.next if page.next else None
+
+        self.assertEqual(titles, self.expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertIsNone(self.client.get(reverse("auction:index")).context["auctions"].prev)
+
+        prev = response.context["auctions"].prev
+        response = self.client.get(reverse("auction:index") + "?page_size=10&cursor=" + prev)
+        self.assertEqual([auction.title for auction in response.context["auctions"]], pages[1])
+
+    def test_page_size_is_capped(self):
+        with self.settings(MAX_PAGE_SIZE=5):
+            response = self.client.get(reverse("browseauctionsapi"), {"page_size": 1000})
+        self.assertEqual(len(response.data), 5)
+        self.assertIn('rel="next"', response["Link"])
+
+    def test_tampered_cursor_serves_first_page(self):
+        response = self.client.get(reverse("browseauctionsapi"), {"cursor": "garbage"})
+        self.assertEqual(response.data[0]["title"], self.expected[0])
+
+    def test_search_pages(self):
+        # bulk_create skips the signals that maintain the index
+        get_index().rebuild()
+        response = self.client.get(reverse("searchauctionwithtermapi"), {"term": "something", "page_size": 20})
+        self.assertEqual(len(response.data), 20)
+        next_url = response["Link"].split(">")[0][1:]
+        response = self.client.get(next_url)
+        self.assertEqual(len(response.data), 5)
+
+
+    def test_cursor_of_another_list_serves_first_page(self):
+        get_index().rebuild()
+        search = {"term": "something", "page_size": 10}
+        first = self.client.get(reverse("searchauctionwithtermapi"), search).data
+        browse_cursor, search_cursor = [
+            parse_qs(urlsplit(response["Link"].split(">")[0][1:]).query)["cursor"][0]
+            for response in [self.client.get(reverse("browseauctionsapi"), {"page_size": 10}),
+                             self.client.get(reverse("searchauctionwithtermapi"), search)]]
+        second = self.client.get(reverse("searchauctionwithtermapi"), dict(search, cursor=search_cursor)).data
+        self.assertNotEqual(second, first)
+        keys = ("deadline_date", "id")
+
+        for cursor in [search_cursor, encode_cursor(NEXT, [timezone.now(), 30, 1], ("created_at", "amount", "id")),
+                       # signed for the browse list, but not shaped like its cursors
+                       encode_cursor(NEXT, [1], keys), encode_cursor(NEXT, ["tomorrow", 1], keys),
+                       encode_cursor(NEXT, [[1], {}], keys), encode_cursor("x", [timezone.now(), 1], keys)]:
+            response = self.client.get(reverse("browseauctionsapi"), {"cursor": cursor})
+            self.assertEqual(response.data[0]["title"], self.expected[0])
+
+        for cursor in [browse_cursor, encode_cursor(NEXT, ["10"], RANKED), encode_cursor(NEXT, [-10], RANKED)]:
+            response = self.client.get(reverse("searchauctionwithtermapi"), dict(search, cursor=cursor))
+            self.assertEqual(response.data, first)
+
+
+class StreamingBrowseTest(TestCase):
+    """Test for streaming the browse API"""
+
+    def setUp(self):
+        seller = User.objects.create(username="seller", email="seller@mail.com")
+        deadline_date = timezone.now() + timezone.timedelta(days=5)
+        AuctionModel.objects.bulk_create([
+            AuctionModel(seller=seller, title="item%d" % i, description="something", minimum_price=10,
+                         highest_bid=10, deadline_date=deadline_date + timezone.timedelta(hours=i))
+            for i in range(30)
+        ] + [AuctionModel(seller=seller, title="banned", description="something", minimum_price=10,
+                          highest_bid=10, deadline_date=deadline_date, status=AuctionModel.BANNED)])
+
+    def test_stream_json_array(self):
+        with self.settings(STREAM_CHUNK_SIZE=7):
+            response = self.client.get(reverse("browseauctionsapi"), {"stream": "json"})
+            self.assertTrue(response.streaming)
+            data = json.loads(b"".join(response.streaming_content))
+
+        self.assertEqual([auction["title"] for auction in data], ["item%d" % i for i in range(30)])
+        self.assertEqual(set(data[0]), {"title", "description", "minimum_price", "deadline_date", "seller"})
+        self.assertEqual(data[0]["seller"], "seller")
+
+    def test_stream_ndjson(self):
+        response = self.client.get(reverse("browseauctionsapi"), {"stream": "ndjson"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 30)
+        self.assertEqual(json.loads(lines[-1])["title"], "item29")
+
+
+class AuctionCardCacheTest(TestCase):
+    """Test for the rendered auction card cache"""
+
+    def setUp(self):
+        cache.clear()
+        caches["cards"].clear()
+        self.seller = User.objects.create(username="seller", email="seller@mail.com")
+        self.bidder = User.objects.create(username="bidder", email="bidder@mail.com")
+        self.auction = AuctionModel.objects.create(seller=self.seller, title="item", description="something",
+                                                   minimum_price=10, highest_bid=10,
+                                                   deadline_date=timezone.now() + timezone.timedelta(days=5))
+
+    def test_bid_refreshes_card(self):
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, "Highest bid: 10.00€")
+
+        place_bid(self.auction.id, self.bidder, 12.5)
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, "Highest bid: 12.50€")
+        self.assertContains(response, "Auction version 1")
+
+    def test_cards_have_a_cache_of_their_own(self):
+        self.client.get(reverse("index"))
+        self.client.cookies[settings.CURRENCY_COOKIE_NAME] = "usd"
+        self.client.get(reverse("index"))
+
+        # their churn never culls the shared rates and counters
+        self.assertEqual(len([key for key in caches["cards"]._cache if "auction_card" in key]), 2)
+        self.assertFalse([key for key in cache._cache if "auction_card" in key])
+
+    def test_currency_in_key(self):
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, "Highest bid: 10.00€")
+
+        self.client.cookies[settings.CURRENCY_COOKIE_NAME] = "usd"
+        response = self.client.get(reverse("index"))
+        self.assertContains(response, "$11.11")
+
+
+class ExchangeRateTest(TestCase):
+    """Test for the cached exchange rate service"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_served_from_cache(self):
+        self.assertEqual(get_quotes()["USDEUR"], 0.9)
+        with mock.patch.object(StubProvider, "fetch") as fetch:
+            response = self.client.get(reverse("changeCurrency", args=("usd",)))
+            self.assertFalse(fetch.called)
+        self.assertEqual(response.cookies[settings.CURRENCY_COOKIE_NAME].value, "usd")
+
+    @override_settings(TASK_QUEUE_EAGER=False)
+    def test_stale_rate_refreshed_in_background(self):
+        get_quotes()
+        cache.delete(RATES_KEY)
+
+        with mock.patch.object(StubProvider, "QUOTES", {"USDEUR": 0.8}):
+            self.assertEqual(get_quotes()["USDEUR"], 0.9)
+            self.assertEqual(get_quotes()["USDEUR"], 0.9)
+            self.assertEqual(Task.objects.filter(name="auction.refresh_rates").count(), 1)
+
+            run_pending()
+            self.assertEqual(get_quotes()["USDEUR"], 0.8)
+
+    def test_stale_rate_refreshed_in_a_thread_without_a_worker(self):
+        get_quotes()
+        cache.delete(RATES_KEY)
+
+        with mock.patch.object(StubProvider, "QUOTES", {"USDEUR": 0.8}):
+            self.assertEqual(get_quotes()["USDEUR"], 0.9)
+            for thread in threading.enumerate():
+                if thread.name == "refresh-rates":
+                    thread.join()
+            self.assertEqual(get_quotes()["USDEUR"], 0.8)
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASK_QUEUE_EAGER=False)
+    def test_provider_down_keeps_last_rate(self):
+        get_quotes()
+        cache.delete(RATES_KEY)
+
+        with mock.patch.object(StubProvider, "fetch", side_effect=requests.ConnectionError):
+            run_pending()
+            get_quotes()
+            run_pending()
+            self.assertEqual(get_quotes()["USDEUR"], 0.9)
+
+    @override_settings(EXCHANGE_RATE_PROVIDER=None)
+    def test_without_provider_only_the_base_currency_is_offered(self):
+        self.assertIsNone(get_quotes())
+        response = self.client.get(reverse("changeCurrency", args=("usd",)))
+        self.assertContains(response, "Currency exchange is not available at the moment")
+        self.assertNotIn(settings.CURRENCY_COOKIE_NAME, response.cookies)
+
+
+class PriceConversionTest(TestCase):
+    """Test for converting prices in the database"""
+
+    def setUp(self):
+        cache.clear()
+        seller = User.objects.create(username="seller", email="seller@mail.com")
+        self.auction = AuctionModel.objects.create(seller=seller, title="item", description="something",
+                                                   minimum_price=9, highest_bid=18,
+                                                   deadline_date=timezone.now() + timezone.timedelta(days=5))
+
+    def test_annotated_stored_amounts_untouched(self):
+        auctions, currency = with_prices(AuctionModel.objects.all(), "sek")
+        auction = auctions.get()
+        self.assertEqual(currency, "sek")
+        self.assertAlmostEqual(auction.minimum_price_converted, 96)
+        self.assertAlmostEqual(auction.highest_bid_converted, 192)
+        self.assertEqual((auction.minimum_price, auction.highest_bid), (9, 18))
+
+    def test_unknown_rate_falls_back_to_base(self):
+        with mock.patch.object(StubProvider, "QUOTES", {"USDEUR": 0.9}):
+            auctions, currency = with_prices(AuctionModel.objects.all(), "sek")
+        self.assertEqual(currency, "eur")
+        self.assertEqual(auctions.get().minimum_price_converted, 9)
+
+    def test_api_currency(self):
+        response = self.client.get(reverse("browseauctionsapi"), {"currency": "usd"})
+        self.assertAlmostEqual(response.data[0]["minimum_price"], 10)
+
+        response = self.client.get(reverse("searchauctionbyidapi", args=(self.auction.id,)))
+        self.assertEqual(response.data["minimum_price"], 9)
+
+
+class MoneyTest(TestCase):
+    """Test for the integer cents money type"""
+
+    def test_parse(self):
+        self.assertEqual(Money.parse("12.345").cents, 1235)
+        self.assertEqual(Money.parse(0.1 + 0.2).cents, 30)
+        self.assertEqual(str(Money.parse(12)), "12.00")
+        self.assertRaises(ValueError, Money.parse, "text")
+        self.assertRaises(ValueError, Money.parse, "nan")
+        self.assertRaises(ValueError, Money.parse, "1e30")
+        self.assertRaises(ValueError, Money.parse, "1e20")
+        self.assertEqual(Money.parse("-92233720368547758.07").cents, -2 ** 63 + 1)
+        # a form says so instead of failing
+        self.assertRaises(ValidationError, MoneyFormField().clean, "1e20")
+
+    def test_compares_with_whole_units(self):
+        self.assertEqual(Money(1200), 12)
+        self.assertLess(Money(1200), 12.01)
+        self.assertEqual(Money(1250) + 1, Money(1350))
+        self.assertEqual(float(Money(1250)), 12.5)
+
+
+class GenerateDataTest(TestCase):
+    """Test for the synthetic data generator"""
+
+    def test_generate(self):
+        user_ids, auction_ids = generate(users=5, auctions=30, bids=200, seed=1, batch_size=7)
+
+        self.assertEqual(User.objects.filter(id__in=user_ids, language__language="en").count(), 5)
+        self.assertTrue(User.objects.get(id=user_ids[0]).check_password("yaas1234"))
+        self.assertEqual(AuctionModel.objects.filter(id__in=auction_ids).count(), 30)
+        self.assertEqual(Bid.objects.count(), 200)
+        self.assertEqual(sum(AuctionModel.objects.values_list("bid_count", flat=True)), 200)
+
+        for auction in AuctionModel.objects.exclude(bid_count=0):
+            top = auction.bids.order_by("-amount").first()
+            self.assertEqual((auction.highest_bid, auction.highest_bidder_id), (top.amount, top.bidder_id))
+            self.assertFalse(auction.bids.filter(bidder_id=auction.seller_id).exists())
+
+        # new rows keep counting after the explicit ids
+        self.assertGreater(User.objects.create_user("late").id, user_ids[-1])
+
+
+class MetricsTest(TestCase):
+    """Test for the request metrics served at /metrics"""
+
+    def setUp(self):
+        registry._series.clear()
+
+    def test_request_recorded_by_view(self):
+        self.client.get(reverse("index"))
+        self.client.get(reverse("browseauctionsapi"))
+
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('yaas_requests_total{status="200",view="index"} 1.0', body)
+        self.assertIn('yaas_request_duration_seconds_count{view="browseauctionsapi"} 1.0', body)
+        self.assertIn('yaas_request_duration_seconds_bucket{le="+Inf",view="index"} 1.0', body)
+        self.assertIn("# TYPE yaas_request_duration_seconds histogram", body)
+        self.assertIn("yaas_task_queue_depth 0.0", body)
+        queries = [line for line in body.splitlines() if line.startswith('yaas_sql_queries_total{view="index"}')]
+        self.assertGreater(float(queries[0].split()[-1]), 0)
+
+    def test_processes_added_up(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            with open(os.path.join(directory, "metrics_1.json"), "w") as f:
+                json.dump({'yaas_requests_total{status="200",view="index"}': 4}, f)
+            self.client.get(reverse("index"))
+
+            body = registry.render()
+        self.assertIn('yaas_requests_total{status="200",view="index"} 5.0', body)
+
+    def test_remote_address_checked(self):
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 403)
+
+
+class UserForeignKeyTest(TestCase):
+    """Test for the seller and highest bidder foreign keys"""
+
+    def setUp(self):
+        self.seller = User.objects.create(username="seller", email="seller@mail.com")
+        self.bidder = User.objects.create(username="bidder", email="bidder@mail.com")
+        deadline_date = timezone.now() + timezone.timedelta(days=5)
+        AuctionModel.objects.bulk_create([
+            AuctionModel(seller=self.seller, title="item%d" % i, description="something", minimum_price=10,
+                         highest_bid=10, deadline_date=deadline_date) for i in range(30)
+        ])
+
+    def test_listing_joins_the_seller(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("index"))
+        self.assertContains(response, "Seller: seller", count=20)
+
+    def test_removed_users_leave_the_auction(self):
+        auction = AuctionModel.objects.first()
+        place_bid(auction.id, self.bidder, 11)
+
+        self.bidder.delete()
+        self.seller.delete()
+        auction.refresh_from_db()
+        self.assertEqual((auction.seller, auction.highest_bidder, auction.highest_bid), (None, None, 11))
+
+        AuctionModel.objects.update(deadline_date=timezone.now() - timezone.timedelta(days=1))
+        self.assertEqual(len(self.client.get(reverse("auction:resolve")).json()["resolved_auctions"]), 30)
+
+
+class TokenAuthenticationTest(TestCase):
+    """Test for bidding through the API with a cached token"""
+
+    def setUp(self):
+        forget()
+        seller = User.objects.create(username="seller", email="seller@mail.com")
+        User.objects.create_user("bidder", "bidder@mail.com", "123")
+        self.auction = AuctionModel.objects.create(seller=seller, title="item", description="something",
+                                                   minimum_price=10, highest_bid=10,
+                                                   deadline_date=timezone.now() + timezone.timedelta(days=5))
+
+    def obtain_token(self):
+        response = self.client.post(reverse("tokenapi"), {"username": "bidder", "password": "123"})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["token"]
+
+    def bid(self, token, amount):
+        return self.client.post(reverse("bidauctionapi", args=(self.auction.id,)), {"new_price": amount},
+                                HTTP_AUTHORIZATION="Token " + token)
+
+    def test_token_resolved_once(self):
+        token = self.obtain_token()
+        self.assertEqual(self.obtain_token(), token)
+        self.assertEqual(self.bid(token, 11).status_code, 200)
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.bid(token, 12).status_code, 200)
+        self.assertFalse([query for query in context.captured_queries if "authtoken_token" in query["sql"]])
+
+    def test_expired_token_looked_up_again(self):
+        token = self.obtain_token()
+        with self.settings(API_TOKEN_CACHE_TTL=-1):
+            self.bid(token, 11)
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.bid(token, 12).status_code, 200)
+        self.assertTrue([query for query in context.captured_queries if "authtoken_token" in query["sql"]])
+
+    def test_rotated_token_is_revoked(self):
+        token = self.obtain_token()
+        self.assertEqual(self.bid(token, 11).status_code, 200)
+
+        response = self.client.post(reverse("rotatetokenapi"), HTTP_AUTHORIZATION="Token " + token)
+        new_token = response.json()["token"]
+        self.assertNotEqual(new_token, token)
+        self.assertEqual(self.bid(token, 12).status_code, 401)
+        self.assertEqual(self.bid(new_token, 12).status_code, 200)
+
+    def test_revocation_in_another_process(self):
+        token = self.obtain_token()
+        self.bid(token, 11)
+
+        # another process deleted the token, this one only sees the counter in the shared cache move
+        with mock.patch("auction.authentication.forget"):
+            Token.objects.filter(key=token).delete()
+        self.assertEqual(self.bid(token, 12).status_code, 401)
+
+    def test_revocation_after_the_counter_was_evicted(self):
+        token = self.obtain_token()
+        cache.set(REVOCATION_KEY, 1, None)
+        self.bid(token, 11)
+
+        # evicted while this process still holds the token under the old value
+        cache.delete(REVOCATION_KEY)
+        with mock.patch("auction.authentication.forget"):
+            Token.objects.filter(key=token).delete()
+        self.assertEqual(self.bid(token, 12).status_code, 401)
+
+    def test_deactivated_user_is_revoked(self):
+        token = self.obtain_token()
+        self.assertEqual(self.bid(token, 11).status_code, 200)
+
+        user = User.objects.get(username="bidder")
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.bid(token, 12).status_code, 401)
+
+    def test_cached_inactive_user_is_turned_down(self):
+        token = Token.objects.select_related("user").get(key=self.obtain_token())
+        token.user.is_active = False
+        _remember(token, revocations())
+        self.assertEqual(self.bid(token.key, 11).status_code, 401)
+
+
+@override_settings(SELLER_DIGEST_WINDOW=300)
+class SellerDigestTest(TestCase):
+    """Test for summing up the bids of a window in one message to the seller"""
+
+    def setUp(self):
+        cache.clear()
+        seller = User.objects.create(username="seller", email="seller@mail.com")
+        self.bidders = [User.objects.create(username="bidder%d" % i, email="bidder%d@mail.com" % i) for i in range(5)]
+        deadline_date = timezone.now() + timezone.timedelta(days=5)
+        self.auctions = [AuctionModel.objects.create(seller=seller, title="item%d" % i, description="something",
+                                                     minimum_price=10, highest_bid=10, deadline_date=deadline_date)
+                         for i in range(2)]
+
+    def bid(self, bidder, auction, amount):
+        self.client.force_login(bidder)
+        self.client.post(reverse("auction:bid", args=(auction.id,)), {"new_price": amount})
+
+    def test_bids_of_a_window_in_one_message(self):
+        for i, bidder in enumerate(self.bidders):
+            self.bid(bidder, self.auctions[0], 11 + i)
+        self.bid(self.bidders[0], self.auctions[1], 20)
+
+        # the bidders are told right away, the seller when the window closes
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["bidder%d@mail.com" % i for i in [0, 0, 1, 2, 3, 4]])
+        digest = Task.objects.get()
+        self.assertEqual(digest.name, "auction.seller_digest")
+        self.assertGreater(digest.run_at, timezone.now() + timezone.timedelta(seconds=290))
+
+        Task.objects.update(run_at=timezone.now())
+        mail.outbox = []
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["seller@mail.com"])
+        self.assertIn("Auction #%d item0: 5 new bids, the highest is 15.00" % self.auctions[0].id, mail.outbox[0].body)
+        self.assertIn("Auction #%d item1: 1 new bid, the highest is 20.00" % self.auctions[1].id, mail.outbox[0].body)
+
+    @override_settings(SELLER_DIGEST_WINDOW=None)
+    def test_every_bid_without_digest(self):
+        for i, bidder in enumerate(self.bidders):
+            self.bid(bidder, self.auctions[0], 11 + i)
+
+        self.assertEqual(len([m for m in mail.outbox if m.to == ["seller@mail.com"]]), 5)
+        self.assertFalse(Task.objects.exists())
+
+
+class FileSequencer(BidSequencer):
+    """A sequencer whose writers open connections of their own to the SQLite database file `name`"""
+
+    def __init__(self, name, *args):
+        self.name = name
+        super().__init__(*args)
+
+    def run(self, partition):
+        connections["default"] = DatabaseWrapper(dict(connection.settings_dict, NAME=self.name), "default")
+        super().run(partition)
+
+
+class BidSequencerTest(TestCase):
+    """Test for settling the bids of an auction in one writer thread"""
+
+    def setUp(self):
+        seller = User.objects.create(username="seller", email="seller@mail.com")
+        self.bidders = [User.objects.create(username="bidder%d" % i, email="bidder%d@mail.com" % i) for i in range(8)]
+        self.auction = AuctionModel.objects.create(seller=seller, title="item", description="something",
+                                                   minimum_price=10, highest_bid=10,
+                                                   deadline_date=timezone.now() + timezone.timedelta(days=5))
+        connection.inc_thread_sharing()
+        self.sequencer = BidSequencer(2, 50, 100, connections_override={"default": connections["default"]})
+
+    def tearDown(self):
+        self.sequencer.stop()
+        connection.dec_thread_sharing()
+
+    def test_concurrent_bids_are_sequenced(self):
+        def bid(bidder):
+            return [self.sequencer.submit(self.auction.id, bidder, 11 + i).status for i in range(20)]
+
+        with ThreadPoolExecutor(len(self.bidders)) as executor:
+            statuses = [status for bids in executor.map(bid, self.bidders) for status in bids]
+
+        accepted = statuses.count(BidResult.ACCEPTED)
+        self.auction.refresh_from_db()
+        self.assertLessEqual(accepted, 20)
+        self.assertEqual((self.auction.version, self.auction.bid_count, self.auction.highest_bid),
+                         (accepted, accepted, 30))
+        self.assertEqual(self.auction.bids.count(), accepted)
+        self.assertEqual(statuses.count(BidResult.OUTBID), 8 * 20 - accepted)
+
+    def test_bids_on_many_auctions_are_written_concurrently(self):
+        auctions = [self.auction] + [AuctionModel.objects.create(
+            seller=self.auction.seller, title="item%d" % i, description="something", minimum_price=10, highest_bid=10,
+            deadline_date=self.auction.deadline_date) for i in range(7)]
+        with tempfile.TemporaryDirectory() as directory:
+            # writers contend for the lock of a database file only on connections of their own
+            name = os.path.join(directory, "db.sqlite3")
+            connection.ensure_connection()
+            with closing(sqlite3.connect(name)) as database:
+                # the full-text index is left out, a dump cannot restore it
+                database.executescript("\n".join(statement for statement in connection.connection.iterdump()
+                                                 if "auction_search" not in statement))
+            # with one auction kept in memory per thread nearly every batch reads the auctions it writes again
+            sequencer = FileSequencer(name, 4, 50, 1)
+
+            def bid(n):
+                # every bidder starts at another auction, so all the writers are busy at once
+                return [(auction.id, sequencer.submit(auction.id, self.bidders[n], 11 + i, timeout=30).status)
+                        for i in range(10) for auction in auctions[n:] + auctions[:n]]
+
+            try:
+                with ThreadPoolExecutor(len(self.bidders)) as executor:
+                    statuses = [status for bids in executor.map(bid, range(len(self.bidders))) for status in bids]
+            finally:
+                sequencer.stop()
+
+            with closing(sqlite3.connect(name)) as database:
+                written = {row[0]: row[1:] for row in database.execute(
+                    "SELECT id, version, bid_count, (SELECT COUNT(*) FROM auction_bid WHERE auction_id = a.id) "
+                    "FROM auction_auctionmodel a")}
+        for auction in auctions:
+            accepted = statuses.count((auction.id, BidResult.ACCEPTED))
+            self.assertGreater(accepted, 0)
+            self.assertEqual(written[auction.id], (accepted, accepted, accepted))
+
+    def test_write_from_elsewhere_is_noticed(self):
+        self.assertEqual(self.sequencer.submit(self.auction.id, self.bidders[0], 11).status, BidResult.ACCEPTED)
+        place_bid(self.auction.id, self.bidders[1], 20)
+
+        self.assertEqual(self.sequencer.submit(self.auction.id, self.bidders[2], 15).status, BidResult.OUTBID)
+        result = self.sequencer.submit(self.auction.id, self.bidders[2], 21, version=2)
+        self.assertEqual((result.status, result.auction.version), (BidResult.ACCEPTED, 3))
+
+        AuctionModel.objects.filter(id=self.auction.id).update(status=AuctionModel.BANNED)
+        self.assertEqual(self.sequencer.submit(self.auction.id, self.bidders[3], 30).status, BidResult.INACTIVE)
+        self.assertEqual(list(self.auction.bids.order_by("amount").values_list("amount", flat=True)), [11, 20, 21])
+
+    def test_failed_transaction_keeps_the_bids_committed_before(self):
+        other = AuctionModel.objects.create(seller=self.auction.seller, title="other", description="something",
+                                            minimum_price=10, highest_bid=10, deadline_date=self.auction.deadline_date)
+        # the writer keeps the auction as it was before a bid from elsewhere, its bid is settled in a second transaction
+        self.sequencer.auctions[0][self.auction.id] = AuctionModel.objects.get(id=self.auction.id)
+        place_bid(self.auction.id, self.bidders[0], 15)
+        batch = [(other.id, self.bidders[1], Money.parse(11), None, Future()),
+                 (self.auction.id, self.bidders[2], Money.parse(20), None, Future())]
+
+        bulk_create = Bid.objects.bulk_create
+        calls = []
+
+        def fail_second(bids):
+            calls.append(bids)
+            if len(calls) > 1:
+                raise OperationalError("database is locked")
+            return bulk_create(bids)
+
+        with mock.patch.object(Bid.objects, "bulk_create", side_effect=fail_second):
+            self.sequencer.flush(0, batch)
+
+        self.assertEqual(batch[0][4].result().status, BidResult.ACCEPTED)
+        self.assertIsInstance(batch[1][4].exception(), OperationalError)
+        self.assertEqual(list(Bid.objects.order_by("id").values_list("auction_id", "amount")),
+                         [(self.auction.id, 15), (other.id, 11)])
+
+    def test_maximum_bids_answer_sequenced_bids(self):
+        place_max_bid(self.auction.id, self.bidders[0], 50)
+        result = self.sequencer.submit(self.auction.id, self.bidders[1], 20)
+
+        self.assertEqual((result.status, result.auction.highest_bid), (BidResult.ACCEPTED, 20))
+        self.auction.refresh_from_db()
+        self.assertEqual((self.auction.highest_bid, self.auction.highest_bidder_id, self.auction.version),
+                         (Money.parse("20.01"), self.bidders[0].id, 3))
+        result = self.sequencer.submit(self.auction.id, self.bidders[1], 21, version=3)
+        self.assertEqual((result.status, self.auction.bids.count()), (BidResult.ACCEPTED, 5))
+
+    def test_bid_view(self):
+        self.client.force_login(self.bidders[0])
+        with self.settings(BID_SEQUENCER=True), mock.patch("auction.sequencer.get_sequencer",
+                                                           return_value=self.sequencer):
+            response = self.client.post(reverse("auction:bid", args=(self.auction.id,)), {"new_price": 12})
+
+        self.assertEqual(response.status_code, 302)
+        self.auction.refresh_from_db()
+        self.assertEqual((self.auction.highest_bid, self.auction.highest_bidder_id), (12, self.bidders[0].id))
+
+
+class ProxyBidTest(TestCase):
+    """Test for bidding up to a registered maximum on behalf of the bidder"""
+
+    def setUp(self):
+        self.seller = User.objects.create(username="seller", email="seller@mail.com")
+        self.bidders = [User.objects.create(username="bidder%d" % i, email="bidder%d@mail.com" % i) for i in range(3)]
+        self.auction = AuctionModel.objects.create(seller=self.seller, title="item", description="something",
+                                                   minimum_price=10, highest_bid=10,
+                                                   deadline_date=timezone.now() + timezone.timedelta(days=5))
+
+    def history(self):
+        return [(bid.bidder_id, str(bid.amount)) for bid in self.auction.bids.order_by("amount")]
+
+    def test_maximum_bids_answer_each_other(self):
+        first, second, third = self.bidders
+        self.assertEqual(place_max_bid(self.auction.id, first, 50).status, BidResult.ACCEPTED)
+        self.assertEqual(place_max_bid(self.auction.id, second, 30).status, BidResult.ACCEPTED)
+        # the bid stands, but the first maximum answers it before it returns
+        result = place_bid(self.auction.id, third, 40)
+        self.assertEqual((result.status, result.auction.highest_bidder_id), (BidResult.ACCEPTED, first.id))
+        result = place_max_bid(self.auction.id, second, 60)
+
+        self.assertEqual((result.auction.highest_bid, result.auction.highest_bidder_id),
+                         (Money.parse("50.01"), second.id))
+        self.assertEqual(self.history(), [(first.id, "10.01"), (second.id, "30.00"), (first.id, "30.01"),
+                                          (third.id, "40.00"), (first.id, "40.01"), (first.id, "50.00"),
+                                          (second.id, "50.01")])
+        self.auction.refresh_from_db()
+        self.assertEqual((self.auction.highest_bid, self.auction.highest_bidder_id), (result.auction.highest_bid,
+                                                                                      second.id))
+        self.assertEqual((self.auction.version, self.auction.bid_count), (7, 7))
+
+    def test_tie_goes_to_the_earlier_maximum(self):
+        first, second, _ = self.bidders
+        place_max_bid(self.auction.id, first, 50)
+        result = place_max_bid(self.auction.id, second, 50)
+
+        self.assertEqual((result.status, result.auction.highest_bid, result.auction.highest_bidder_id),
+                         (BidResult.ACCEPTED, 50, first.id))
+        self.assertEqual(self.history(), [(first.id, "10.01"), (first.id, "50.00")])
+        self.assertEqual(place_bid(self.auction.id, second, 50).status, BidResult.OUTBID)
+
+    def test_maximum_is_validated_like_a_bid(self):
+        self.assertEqual(place_max_bid(self.auction.id, self.seller, 50).status, BidResult.OWN_AUCTION)
+        self.assertEqual(place_max_bid(self.auction.id, self.bidders[0], 10).status, BidResult.OUTBID)
+        self.assertEqual(place_max_bid(self.auction.id, self.bidders[0], 50, version=3).status, BidResult.CONFLICT)
+        AuctionModel.objects.filter(id=self.auction.id).update(deadline_date=timezone.now())
+        self.assertEqual(place_max_bid(self.auction.id, self.bidders[0], 50).status, BidResult.INACTIVE)
+        self.assertFalse(ProxyBid.objects.exists())
+
+    def test_bid_in_between_is_settled_against(self):
+        first, second, _ = self.bidders
+        stale = AuctionModel.objects.get(id=self.auction.id)
+        place_bid(self.auction.id, second, 30)
+
+        # the maximum was checked against the row before the bid committed
+        with mock.patch.object(AuctionModel.objects, 'get', side_effect=[stale, AuctionModel.objects.get(id=stale.id)]):
+            result = place_max_bid(self.auction.id, first, 50)
+
+        self.assertEqual((result.status, result.auction.highest_bid, result.auction.highest_bidder_id),
+                         (BidResult.ACCEPTED, Money.parse("30.01"), first.id))
+        self.auction.refresh_from_db()
+        self.assertEqual((self.auction.highest_bidder_id, self.auction.version, self.auction.bid_count),
+                         (first.id, 2, 2))
+
+    def test_maximum_stops_at_the_deadline(self):
+        place_max_bid(self.auction.id, self.bidders[0], 50)
+        AuctionModel.objects.filter(id=self.auction.id).update(status=AuctionModel.BANNED)
+        self.assertEqual(place_bid(self.auction.id, self.bidders[1], 20).status, BidResult.INACTIVE)
+        self.assertEqual(len(self.history()), 1)
+
+    def test_api(self):
+        self.client.force_login(self.bidders[0])
+        response = self.client.post(reverse("auction:proxy", args=(self.auction.id,)), {"max_price": 50})
+        self.assertEqual(response.status_code, 302)
+        for data in [{"max_price": "much"}, {"max_price": "NaN"}, {}]:
+            response = self.client.post(reverse("auction:proxy", args=(self.auction.id,)), data)
+            self.assertContains(response, "Maximum bid must be a number")
+
+        token = "Token " + Token.objects.create(user=self.bidders[1]).key
+        response = self.client.post(reverse("proxybidauctionapi", args=(self.auction.id,)), {"max_price": 30},
+                                    HTTP_AUTHORIZATION=token)
+        self.assertEqual((response.status_code, response.data["current_price"], response.data["leading"]),
+                         (200, 30.01, False))
+        response = self.client.post(reverse("proxybidauctionapi", args=(self.auction.id,)), {"max_price": "much"},
+                                    HTTP_AUTHORIZATION=token)
+        self.assertEqual(response.status_code, 400)
+
+    def test_bidder_outbid_by_a_maximum_is_told_so(self):
+        first, second, third = self.bidders
+        place_max_bid(self.auction.id, first, 100)
+        mail.outbox = []
+
+        self.client.force_login(second)
+        response = self.client.post(reverse("auction:bid", args=(self.auction.id,)), {"new_price": 20}, follow=True)
+        self.assertContains(response, "the maximum bid of another bidder outbid it")
+
+        token = "Token " + Token.objects.create(user=third).key
+        response = self.client.post(reverse("bidauctionapi", args=(self.auction.id,)), {"new_price": 30},
+                                    HTTP_AUTHORIZATION=token)
+        self.assertEqual((response.status_code, response.data["message"], response.data["current_price"],
+                          response.data["leading"]), (200, "Bid placed, but outbid by a maximum bid", 30.01, False))
+
+        # the seller hears of both bids, neither bidder is told they lead
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [self.seller.email] * 2)
+
+
+class BidHistoryApiTest(TestCase):
+    """Test for paging through the bids of an auction"""
+
+    def setUp(self):
+        seller = User.objects.create(username="seller", email="seller@mail.com")
+        self.bidder = User.objects.create(username="bidder", email="bidder@mail.com")
+        self.auction = AuctionModel.objects.create(seller=seller, title="item", description="something",
+                                                   minimum_price=10, highest_bid=10,
+                                                   deadline_date=timezone.now() + timezone.timedelta(days=5))
+        for amount in range(11, 36):
+            place_bid(self.auction.id, self.bidder, amount)
+        self.url = reverse("bidhistoryapi", args=(self.auction.id,))
+
+    def test_pages_follow_the_bids(self):
+        response = self.client.get(self.url, {"page_size": 10})
+        amounts = [bid["amount"] for bid in response.data]
+        while "Link" in response and 'rel="next"' in response["Link"]:
+            response = self.client.get(response["Link"].split(">")[0][1:])
+            amounts += [bid["amount"] for bid in response.data]
+
+        self.assertEqual(amounts, list(range(11, 36)))
+        self.assertEqual(response.data[0]["bidder"], "bidder")
+
+    def test_bids_with_the_same_time_are_paged_in_order(self):
+        since, created_at = self.auction.bids.latest("created_at").created_at, timezone.now()
+        Bid.objects.bulk_create([Bid(auction=self.auction, bidder=self.bidder, amount=amount, created_at=created_at)
+                                 for amount in range(36, 46)])
+        first = self.client.get(self.url, {"since": since, "page_size": 6})
+        second = self.client.get(first["Link"].split(">")[0][1:])
+
+        self.assertEqual([bid["amount"] for bid in first.data + second.data], list(range(36, 46)))
+
+    def test_since_returns_only_new_bids(self):
+        last = self.client.get(self.url, {"page_size": 100}).data[-1]["created_at"]
+        place_bid(self.auction.id, self.bidder, 40)
+
+        response = self.client.get(self.url, {"since": last})
+        self.assertEqual([bid["amount"] for bid in response.data], [40])
+        for since in ["yesterday", "2020-13-45T00:00:00", "2020-02-30T25:00:00+01:00"]:
+            self.assertEqual(self.client.get(self.url, {"since": since}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("bidhistoryapi", args=(0,))).status_code, 404)
+
+    def test_unchanged_history_is_not_sent_again(self):
+        response = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual((not_modified.status_code, not_modified["ETag"]), (304, response["ETag"]))
+
+        place_bid(self.auction.id, self.bidder, 40)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+
+
+class ConditionalResponseTest(TestCase):
+    """Test for answering unchanged auctions with 304 Not Modified"""
+
+    def setUp(self):
+        cache.clear()
+        self.seller = User.objects.create(username="seller", email="seller@mail.com")
+        self.bidder = User.objects.create(username="bidder", email="bidder@mail.com")
+        self.auction = AuctionModel.objects.create(seller=self.seller, title="item", description="something",
+                                                   minimum_price=10, highest_bid=10,
+                                                   deadline_date=timezone.now() + timezone.timedelta(days=5))
+
+    def revalidate(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_auction_follows_its_version(self):
+        url = reverse("searchauctionbyidapi", args=(self.auction.id,))
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertTrue({"Accept-Language", "Cookie"} <= {header.strip() for header in response["Vary"].split(",")})
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, etag), 304)
+        self.assertEqual(self.revalidate(url, etag, currency="usd"), 200)
+
+        place_bid(self.auction.id, self.bidder, 20)
+        self.assertEqual(self.revalidate(url, etag), 200)
+
+    def test_list_follows_the_change_counter(self):
+        url = reverse("browseauctionsapi")
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(url, etag), 304)
+        self.assertEqual(self.revalidate(url, etag, page_size=5), 200)
+
+        # the list shows no bids
+        place_bid(self.auction.id, self.bidder, 20)
+        self.assertEqual(self.revalidate(url, etag), 304)
+
+        with committed():
+            self.auction.status = AuctionModel.BANNED
+            self.auction.save()
+        self.assertEqual(self.revalidate(url, etag), 200)
+
+    def test_list_waits_for_the_commit(self):
+        url = reverse("browseauctionsapi")
+        etag = self.client.get(url)["ETag"]
+        with committed():
+            list(resolve_expired(timezone.now() + timezone.timedelta(days=6)))
+            self.assertEqual(self.revalidate(url, etag), 304)
+        self.assertEqual(self.revalidate(url, etag), 200)
+
+    def test_counter_survives_the_cache(self):
+        etag = self.client.get(reverse("browseauctionsapi"))["ETag"]
+        cache.clear()
+        with committed():
+            AuctionModel.objects.create(seller=self.seller, title="other", description="something", minimum_price=10,
+                                        deadline_date=timezone.now() + timezone.timedelta(days=5))
+        self.assertEqual(self.revalidate(reverse("browseauctionsapi"), etag), 200)
+
+
+class LiveEventsTest(TestCase):
+    """Test for streaming the bids of an auction as they commit"""
+
+    def setUp(self):
+        seller = User.objects.create(username="seller", email="seller@mail.com")
+        self.bidder = User.objects.create(username="bidder", email="bidder@mail.com")
+        self.auction = AuctionModel.objects.create(seller=seller, title="item", description="something",
+                                                   minimum_price=10, highest_bid=10,
+                                                   deadline_date=timezone.now() + timezone.timedelta(days=5))
+
+    def test_hub_keeps_the_latest_events(self):
+        async def follow():
+            hub = Hub(2)
+            first, second = hub.subscribe([1, 2]), hub.subscribe([2])
+            hub.publish([{"auction": 1, "version": 1}, {"auction": 2, "version": 1}, {"auction": 2, "version": 2}])
+            hub.unsubscribe(first, [1, 2])
+            return [first.get_nowait()["version"] for i in range(2)], second.qsize(), set(hub.streams)
+
+        self.assertEqual(asyncio.run(follow()), ([1, 2], 2, {2}))
+
+    def test_asgi_app_needs_the_broker(self):
+        try:
+            sys.modules.pop("yaas.asgi", None)
+            with self.assertRaises(ImproperlyConfigured):
+                importlib.import_module("yaas.asgi")
+            with self.settings(LIVE_EVENTS_BROKER=("127.0.0.1", 8765)):
+                self.assertIsInstance(importlib.import_module("yaas.asgi").application, EventStreamApp)
+        finally:
+            sys.modules.pop("yaas.asgi", None)
+
+    def test_events_are_published_on_commit(self):
+        async def follow():
+            hub = Hub(10)
+            queue = hub.subscribe([self.auction.id])
+            register(hub, asyncio.get_event_loop())
+            try:
+                with committed():
+                    place_bid(self.auction.id, self.bidder, 20)
+                    await asyncio.sleep(0)
+                    self.assertTrue(queue.empty())
+                bid = await asyncio.wait_for(queue.get(), 1)
+
+                with committed():
+                    list(resolve_expired(timezone.now() + timezone.timedelta(days=6)))
+                return bid, await asyncio.wait_for(queue.get(), 1)
+            finally:
+                unregister(hub)
+
+        bid, resolved = asyncio.run(follow())
+        self.assertEqual(bid, {"auction": self.auction.id, "highest_bid": 20.0, "version": 1, "status": "AC"})
+        self.assertEqual((resolved["version"], resolved["status"]), (2, AuctionModel.ADJUDECATED))
+
+    @override_settings(LIVE_EVENTS_HEARTBEAT=0.05)
+    def test_stream(self):
+        async def follow(query):
+            app, sent, disconnected = EventStreamApp(), [], asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "path": "/events/", "method": "GET", "query_string": query}
+            stream = asyncio.ensure_future(app(scope, receive, send))
+            try:
+                while len(sent) < 3 and not stream.done():
+                    await asyncio.sleep(0.01)
+                with committed():
+                    place_bid(self.auction.id, self.bidder, 20)
+                while len(sent) < 4 and not stream.done():
+                    await asyncio.sleep(0.01)
+                disconnected.set()
+                await stream
+                return sent, dict(app.hub.streams)
+            finally:
+                app.stop()
+
+        sent, streams = asyncio.run(follow(b"auction=%d,0" % self.auction.id))
+        self.assertEqual((sent[0]["status"], dict(sent[0]["headers"])[b"content-type"]), (200, b"text/event-stream"))
+        self.assertEqual(sent[2]["body"], b": keep-alive\n\n")
+        self.assertIn(b"event: auction\ndata: ", sent[3]["body"])
+        self.assertEqual(json.loads(sent[3]["body"].split(b"data: ")[1])["highest_bid"], 20.0)
+        self.assertEqual(streams, {})
+
+        sent, _ = asyncio.run(follow(b"auction=first"))
+        self.assertEqual(sent[0]["status"], 400)
+
+    def test_broker_forwards_to_subscribed_processes(self):
+        broker = EventBroker(timeout=30)
+        self.assertEqual(broker.handle(SUBSCRIBE, ("127.0.0.1", 9001), now=0), [])
+        self.assertEqual(broker.handle(SUBSCRIBE, ("127.0.0.1", 9002), now=20), [])
+        self.assertEqual(broker.handle(b"{}", ("127.0.0.1", 9000), now=40), [("127.0.0.1", 9002)])
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        thread = threading.Thread(target=EventBroker().serve, args=(sock,), daemon=True)
+        thread.start()
+
+        async def follow():
+            app = EventStreamApp()
+            await app.start()
+            # only what comes through the broker
+            unregister(app.hub)
+            try:
+                queue = app.hub.subscribe([self.auction.id])
+                for i in range(100):
+                    with committed():
+                        place_bid(self.auction.id, self.bidder, 20 + i)
+                    try:
+                        return await asyncio.wait_for(queue.get(), 0.05)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                app.stop()
+
+        try:
+            with self.settings(LIVE_EVENTS_BROKER=sock.getsockname()):
+                received = asyncio.run(follow())
+        finally:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            thread.join()
+            sock.close()
+        self.assertEqual(received["auction"], self.auction.id)
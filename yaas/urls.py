@@ -18,6 +18,7 @@ from django.urls import path, re_path, include
 
 import auction.services
 import auction.views
+import metrics.views
 import user.views
 
 urlpatterns = [
@@ -29,7 +30,8 @@ urlpatterns = [
     path('signin/', user.views.SignIn.as_view(), name='signin'),
     path('signout/', user.views.signout, name='signout'),
     path('changeLanguage/<lang_code>/', auction.views.changeLanguage, name='changeLanguage'),
-    path('changeCurrency/<currency_code>/', auction.views.changeCurrency, name='changeCurrency')
+    path('changeCurrency/<currency_code>/', auction.views.changeCurrency, name='changeCurrency'),
+    path('metrics', metrics.views.metrics, name='metrics')
 ]
 
 urlpatterns += [
@@ -38,7 +40,11 @@ urlpatterns += [
     re_path(r'^api/v1/search/\??(?:&?[^=&]*=[^=&]*)*', auction.services.SearchAuctionWithTermApi.as_view(),
             name='searchauctionwithtermapi'),
     re_path(r'^api/v1/searchid/(\d+)/$', auction.services.SearchAuctionApiById.as_view(), name='searchauctionbyidapi'),
+    re_path(r'^api/v1/auction/(\d+)/bids/$', auction.services.BidHistoryApi.as_view(), name='bidhistoryapi'),
     re_path(r'^api/v1/bid/(\d+)/$', auction.services.BidAuctionApi.as_view(), name='bidauctionapi'),
+    re_path(r'^api/v1/proxy/(\d+)/$', auction.services.ProxyBidAuctionApi.as_view(), name='proxybidauctionapi'),
+    path('api/v1/token/', auction.services.ObtainTokenApi.as_view(), name='tokenapi'),
+    path('api/v1/token/rotate/', auction.services.RotateTokenApi.as_view(), name='rotatetokenapi'),
 
     path('generatedata', auction.services.GenerateDataAPI.as_view(), name="generatedataapi")
 ]